@@ -0,0 +1,60 @@
+# Overlap tests between enemies and player projectiles: naive all-pairs vs the Broadphase grid.
+# Counts scale with the world so density stays level-like; the grid's cost per entity should stay flat.
+# python Benchmarks/broadphase.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pygame
+
+from Scripts.broadphase import Broadphase
+
+COUNTS = [10, 100, 1000, 5000]
+FRAMES = 20
+AREA_PER_ENTITY = 64 * 64
+
+def world(count, seed=0):
+    rng = random.Random(seed)
+    side = int((count * AREA_PER_ENTITY) ** 0.5)
+    enemies = [pygame.Rect(rng.uniform(0, side), rng.uniform(0, side), 16, 12) for _ in range(count)]
+    shots = [pygame.Rect(rng.uniform(0, side), rng.uniform(0, side), 8, 8) for _ in range(count)]
+    return enemies, shots
+
+def naive(enemies, shots):
+    hits = 0
+    for shot in shots:
+        for enemy in enemies:
+            if enemy.colliderect(shot):
+                hits += 1
+                break
+    return hits
+
+def grid(enemies, shots, broadphase):
+    # enemies come in as Rects like Game builds them, shots as an array like the projectile pool keeps them
+    broadphase.build(enemies)
+    pairs, items = broadphase.query_pairs(shots)
+    return len(set(pairs.tolist()))
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        result = fn(*args)
+    return (time.perf_counter() - start) / FRAMES * 1000, result
+
+if __name__ == '__main__':
+    broadphase = Broadphase()
+    print(f'{"entities":>9} {"naive ms":>10} {"grid ms":>10} {"grid us/entity":>15}')
+    for count in COUNTS:
+        enemies, shots = world(count)
+        grid_ms, grid_hits = timed(grid, enemies, np.array(shots), broadphase)
+        if count <= 1000:
+            naive_ms, naive_hits = timed(naive, enemies, shots)
+            assert naive_hits == grid_hits
+            naive_text = f'{naive_ms:10.3f}'
+        else:
+            naive_text = f'{"(skipped)":>10}'
+        print(f'{count:9} {naive_text} {grid_ms:10.3f} {grid_ms * 1000 / (2 * count):15.3f}')
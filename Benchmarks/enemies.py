@@ -0,0 +1,60 @@
+# Per-object vs batched enemy update time.
+# python Benchmarks/enemies.py [count] [level]
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pygame
+
+from Scripts.assets import AssetRegistry
+from Scripts.tilemap import Tilemap
+from Scripts.entities import Player, Slime
+from Scripts.enemy_batch import EnemyBatch
+from Scripts.spark import Sparks
+
+FRAMES = 300
+
+class BenchGame:
+    # just the parts of Game that enemies touch
+    def __init__(self, level):
+        self.assets = AssetRegistry()
+        self.rng = random.Random(0)
+        self.ticks = 0
+        self.projectiles = []
+        self.sparks = Sparks()
+        self.tilemap = Tilemap(self, tile_size=16)
+        self.tilemap.load('Maps/' + str(level) + '.json')
+        self.player = Player(self, (0, 0), (8, 16))
+
+    def spawn(self, count):
+        rng = random.Random(0)
+        floors = [loc for loc, tile_type, variant in self.tilemap.iter_tiles() if self.tilemap.solid_check((loc[0] * 16, loc[1] * 16)) and not self.tilemap.get_tile((loc[0], loc[1] - 1))]
+        return [Slime(self, (loc[0] * 16, loc[1] * 16 - 12), (16, 12)) for loc in (rng.choice(floors) for _ in range(count))]
+
+def run(count, level, batched):
+    game = BenchGame(level)
+    enemies = game.spawn(count)
+    batch = EnemyBatch(game, enemies) if batched else None
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        if batch:
+            batch.update(game.tilemap)
+        else:
+            for enemy in enemies:
+                enemy.update(game.tilemap)
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+if __name__ == '__main__':
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    print(f'{count} slimes on level {level}, ms per frame')
+    print(f'  per object : {run(count, level, False):7.3f}')
+    print(f'  batched    : {run(count, level, True):7.3f}')
@@ -0,0 +1,61 @@
+# Compares json and binary map loading on a generated map.
+# python Benchmarks/map_load.py [side]   (default side 1000 -> 1M tiles)
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Scripts.tilemap import Tilemap
+
+def rss_kb():
+    try:
+        f = open('/proc/self/statm')
+        pages = int(f.read().split()[1])
+        f.close()
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def generate(side, json_path, map_path):
+    rng = random.Random(0)
+    tilemap = Tilemap(None)
+    types = ['Grass', 'Stone', 'Wall', 'Lava', 'Temp']
+    for x in range(side):
+        for y in range(side):
+            tilemap.set_tile((x, y), rng.choice(types), rng.randrange(9))
+    tilemap.autotile()
+    tilemap.save(json_path)
+    tilemap.save(map_path)
+
+def measure(path):
+    # runs in a fresh interpreter so resident memory is not shared between formats
+    before = rss_kb()
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    tilemap = Tilemap(None)
+    tilemap.load(path)
+    elapsed = time.perf_counter() - start
+    after = rss_kb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{os.path.basename(path):>10}  {len(tilemap.grid):>8} tiles  {elapsed * 1000:9.1f} ms  '
+          f'{(after - before) / 1024:7.1f} MB retained  {(peak - peak_before) / 1024:7.1f} MB peak growth  {os.path.getsize(path) / 1024:9.1f} KB on disk')
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--measure':
+        measure(sys.argv[2])
+        sys.exit()
+
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    folder = tempfile.mkdtemp()
+    json_path = os.path.join(folder, 'bench.json')
+    map_path = os.path.join(folder, 'bench.map')
+    print(f'generating {side}x{side} map in {folder}')
+    generate(side, json_path, map_path)
+
+    for path in [json_path, map_path]:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path], check=True)
@@ -0,0 +1,82 @@
+import json
+
+from Scripts.utils import BASE_IMG_PATH, load_image, load_images, image_paths, preload_images, Animation
+
+MANIFEST = BASE_IMG_PATH + 'manifest.json'
+
+class AssetRegistry:
+    # game.assets: a read-only mapping from asset name to image / image list / Animation, described by Assets/manifest.json.
+    # Assets are loaded a whole group at a time, either on first access or through load_level, and non-resident
+    # groups can be dropped again when a level ends.
+    def __init__(self, manifest = MANIFEST):
+        with open(manifest) as f:
+            data = json.load(f)
+        self.groups = data['groups']
+        self.levels = data.get('levels', {})
+        self.owner = {}  # asset name -> group
+        for group, info in self.groups.items():
+            for name in info['assets']:
+                self.owner[name] = group
+        self.assets = {}
+        self.loaded = set()
+        self.keep_loaded = False  # set by load_all, nothing gets unloaded after it
+
+    def __getitem__(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            self.load_group(self.owner[name])
+            asset = self.assets[name]
+        return asset
+
+    def __contains__(self, name):
+        return name in self.owner
+
+    def names(self, group):
+        return list(self.groups[group]['assets'])
+
+    def load_group(self, group):
+        if group in self.loaded:
+            return
+        entries = self.groups[group]['assets']
+
+        # decode everything the group needs in one parallel batch first
+        paths = []
+        for entry in entries.values():
+            paths.extend([entry['image']] if 'image' in entry else image_paths(entry.get('images') or entry['animation']))
+        preload_images(paths)
+
+        for name, entry in entries.items():
+            if 'image' in entry:
+                self.assets[name] = load_image(entry['image'])
+            elif 'images' in entry:
+                self.assets[name] = load_images(entry['images'])
+            else:
+                self.assets[name] = Animation(load_images(entry['animation']), img_dur=entry.get('img_dur', 5), loop=entry.get('loop', True), sync=entry.get('sync', False))
+        self.loaded.add(group)
+
+    def unload_group(self, group):
+        if group not in self.loaded:
+            return
+        for name in self.groups[group]['assets']:
+            self.assets.pop(name, None)
+        self.loaded.discard(group)
+
+    def load_resident(self):
+        for group, info in self.groups.items():
+            if info.get('resident'):
+                self.load_group(group)
+
+    def load_all(self):
+        # for processes that cycle through every level many times, e.g. batch runner workers
+        for group in self.groups:
+            self.load_group(group)
+        self.keep_loaded = True
+
+    def load_level(self, map_id):
+        # groups the new level doesn't list are dropped, anything it uses without listing is loaded on first access
+        wanted = set(self.levels.get(str(map_id), []))
+        for group in list(self.loaded):
+            if group not in wanted and not self.groups[group].get('resident') and not self.keep_loaded:
+                self.unload_group(group)
+        for group in self.levels.get(str(map_id), []):
+            self.load_group(group)
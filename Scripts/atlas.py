@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+import pygame
+
+from Scripts import pixel_cache
+
+# Packs every image under the assets folder into a few large sheets plus a JSON index:
+#   images : path relative to the assets folder -> [sheet, x, y, w, h]
+#   dirs   : folder -> sorted file names, so load_images doesn't have to list folders at runtime
+#   sources: path -> [mtime_ns, size] of every packed image when the atlas was built
+# Sheets and index are build output in <assets>/atlas/. A folder whose files no longer match the index is
+# served from the loose files instead, until the atlas is rebuilt.
+
+ATLAS_DIR = 'atlas'
+INDEX_FILE = 'index.json'
+VERSION = 2  # 2 added sources
+SHEET_SIZE = 1024
+PADDING = 1
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+
+def find_images(base):
+    images = []
+    dirs = {}
+    for root, folders, files in os.walk(base):
+        folders[:] = sorted(f for f in folders if os.path.join(root, f) != os.path.join(base, ATLAS_DIR))
+        rel_dir = os.path.relpath(root, base).replace(os.sep, '/')
+        names = sorted(files)
+        if any(name.lower().endswith(IMAGE_EXTS) for name in names):
+            dirs[rel_dir] = names
+        for name in names:
+            if name.lower().endswith(IMAGE_EXTS):
+                images.append(name if rel_dir == '.' else rel_dir + '/' + name)
+    return images, dirs
+
+def source_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def pack(sizes, sheet_size):
+    # shelf packing, tallest first: returns (sheet, x, y) per size in the order given
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    placements = [None] * len(sizes)
+    sheet = 0
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = sizes[i][0] + PADDING, sizes[i][1] + PADDING
+        if x + w > sheet_size:
+            x = 0
+            y += shelf_h
+            shelf_h = 0
+        if y + h > sheet_size:
+            sheet += 1
+            x = y = shelf_h = 0
+        placements[i] = (sheet, x, y)
+        x += w
+        shelf_h = max(shelf_h, h)
+    return placements
+
+def build(base):
+    paths, dirs = find_images(base)
+    surfaces = [pygame.image.load(os.path.join(base, path)) for path in paths]
+    sheet_size = max([SHEET_SIZE] + [max(surf.get_size()) + PADDING for surf in surfaces])
+    placements = pack([surf.get_size() for surf in surfaces], sheet_size)
+
+    # sheets are cut down to the area actually used, decoding empty space is wasted startup time
+    extents = {}
+    for surf, (sheet, x, y) in zip(surfaces, placements):
+        w, h = extents.get(sheet, (0, 0))
+        extents[sheet] = (max(w, x + surf.get_width()), max(h, y + surf.get_height()))
+    sheets = [pygame.Surface(extents[i], pygame.SRCALPHA) for i in range(len(extents))]
+    images = {}
+    for path, surf, (sheet, x, y) in zip(paths, surfaces, placements):
+        sheets[sheet].blit(surf, (x, y))
+        images[path] = [sheet, x, y, surf.get_width(), surf.get_height()]
+
+    out_dir = os.path.join(base, ATLAS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    sheet_names = []
+    for i, sheet in enumerate(sheets):
+        sheet_names.append(f'sheet{i}.png')
+        pygame.image.save(sheet, os.path.join(out_dir, sheet_names[-1]))
+    with open(os.path.join(out_dir, INDEX_FILE), 'w') as f:
+        sources = {path : source_stamp(os.path.join(base, path)) for path in paths}
+        json.dump({'version' : VERSION, 'sheets' : sheet_names, 'images' : images, 'dirs' : dirs, 'sources' : sources}, f)
+    return len(images), len(sheets)
+
+class Atlas:
+    # runtime side: images come back as subsurfaces of the sheets, sheets are loaded on first use
+    def __init__(self, base):
+        self.base = base
+        self.sheet_names = []
+        self.sheets = {}
+        self.images = {}
+        self.dirs = {}
+        self.sources = {}
+        self.current = {}  # folder -> whether its files still match the index, checked once per folder
+
+        path = os.path.join(base, ATLAS_DIR, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+            if index.get('version') == VERSION:
+                self.sheet_names = index['sheets']
+                self.images = index['images']
+                self.dirs = index['dirs']
+                self.sources = index['sources']
+
+    def sheet(self, i):
+        if i not in self.sheets:
+            self.sheets[i] = pixel_cache.load(os.path.join(self.base, ATLAS_DIR, self.sheet_names[i])).convert_alpha()
+        return self.sheets[i]
+
+    def folder_current(self, folder):
+        if folder not in self.current:
+            self.current[folder] = self.check_folder(folder)
+        return self.current[folder]
+
+    def check_folder(self, folder):
+        # added, removed or edited files all show up as a different listing or a different mtime/size
+        try:
+            names = sorted(entry.name for entry in os.scandir(os.path.join(self.base, folder)) if entry.is_file())
+        except OSError:
+            return False
+        if names != self.dirs.get(folder):
+            return False
+        for name in names:
+            if not name.lower().endswith(IMAGE_EXTS):
+                continue
+            path = name if folder == '.' else folder + '/' + name
+            try:
+                if source_stamp(os.path.join(self.base, path)) != self.sources.get(path):
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def image(self, path):
+        entry = self.images.get(path)
+        if entry is None or not self.folder_current(path.rpartition('/')[0] or '.'):
+            return None
+        sheet, x, y, w, h = entry
+        return self.sheet(sheet).subsurface((x, y, w, h))
+
+    def listdir(self, path):
+        folder = path.strip('/') or '.'
+        if folder not in self.dirs or not self.folder_current(folder):
+            return None
+        return self.dirs[folder]
+
+if __name__ == '__main__':
+    # python -m Scripts.atlas [assets folder]
+    base = sys.argv[1] if len(sys.argv) > 1 else 'Assets/'
+    count, sheets = build(base)
+    print(f'packed {count} images into {sheets} sheet(s) in {os.path.join(base, ATLAS_DIR)}')
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Runs many headless game sessions in parallel and sums them up per level.
+# Every worker process builds one headless Game with all assets loaded and reuses it for every session
+# it gets, so a session only costs a level reload. Sessions never talk to each other, which keeps scaling
+# linear in the number of cores as long as there are a few sessions per worker.
+#   python -m Scripts.batch --levels 0 1 2 --sessions 1000 --agent random
+
+MAX_STEPS = 60 * 60 * 2  # 2 minutes of game time, then the session counts as a timeout
+CHUNK_SESSIONS = 4  # sessions handed to a worker at once
+
+game = None  # the worker's Game
+
+def init_worker(batch_enemies):
+    global game
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    from main import Game
+    game = Game(headless=True, batch_enemies=batch_enemies)
+    game.assets.load_all()
+
+def random_agent(rng):
+    # holds a random direction for a while, presses buttons now and then
+    from main import LEFT, RIGHT, DOWN, JUMP, BASIC_ATTACK, STRONG_ATTACK, DASH
+    held = [0]
+    def act(state, step):
+        if step % 20 == 0:
+            held[0] = rng.choice([0, LEFT, RIGHT, RIGHT, RIGHT, RIGHT | DOWN])
+        actions = held[0]
+        for press, chance in ((JUMP, 0.06), (BASIC_ATTACK, 0.03), (STRONG_ATTACK, 0.005), (DASH, 0.01)):
+            if rng.random() < chance:
+                actions |= press
+        return actions
+    return act
+
+def rightward_agent(rng):
+    # scripted: run right, jump when stuck or on a timer, shoot when there is mana for it
+    from main import RIGHT, JUMP, BASIC_ATTACK
+    last_x = [None]
+    def act(state, step):
+        player = state['player']
+        actions = RIGHT
+        if player['pos'][0] == last_x[0] or step % 45 == 0:
+            actions |= JUMP
+        if player['mana'] >= 20 and step % 30 == 0:
+            actions |= BASIC_ATTACK
+        last_x[0] = player['pos'][0]
+        return actions
+    return act
+
+def route_agent(path):
+    # replays a route file: [[["RIGHT", "JUMP"], 10], [["RIGHT"], 50], ...] as (action names, steps) pairs, then idles
+    import main
+    with open(path) as f:
+        route = json.load(f)
+    actions = []
+    for names, steps in route:
+        bits = 0
+        for name in names:
+            bits |= getattr(main, name)
+        actions.extend([bits] * steps)
+    def act(state, step):
+        return actions[step] if step < len(actions) else 0
+    return act
+
+AGENTS = {'random' : random_agent, 'rightward' : rightward_agent}
+
+def make_agent(agent, seed):
+    if agent in AGENTS:
+        return AGENTS[agent](random.Random(seed))
+    return route_agent(agent)
+
+def run_session(level, agent, seed, max_steps):
+    # one seeded run from the level start until goal, death or timeout
+    state = game.reset(level, seed)
+    act = make_agent(agent, seed)
+    result = {'level' : level, 'agent' : agent, 'seed' : seed, 'outcome' : 'timeout', 'cause' : None}
+    for step in range(max_steps):
+        state = game.step(act(state, step))
+        if state['won'] or state['level'] != level:
+            result['outcome'] = 'goal'
+            break
+        if state['player']['dead']:
+            result['outcome'] = 'death'
+            result['cause'] = state['player']['death_cause']
+            break
+    result['steps'] = state['step']
+    result['mana_collected'] = state['player']['mana_collected']
+    return result
+
+def run_chunk(sessions):
+    return [run_session(*session) for session in sessions]
+
+def run(sessions, workers = None, batch_enemies = False):
+    chunks = [sessions[i:i + CHUNK_SESSIONS] for i in range(0, len(sessions), CHUNK_SESSIONS)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(batch_enemies,)) as pool:
+        for chunk in pool.map(run_chunk, chunks):
+            results.extend(chunk)
+    return results
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def summarize(results):
+    from main import SIM_RATE
+    summary = {}
+    for level in sorted({result['level'] for result in results}):
+        runs = [result for result in results if result['level'] == level]
+        goal_steps = [result['steps'] for result in runs if result['outcome'] == 'goal']
+        outcomes = Counter(result['outcome'] for result in runs)
+        summary[level] = {
+            'sessions' : len(runs),
+            'completion_rate' : outcomes['goal'] / len(runs),
+            'timeouts' : outcomes['timeout'],
+            'deaths' : dict(Counter(result['cause'] for result in runs if result['outcome'] == 'death')),
+            'time_to_goal' : {
+                'mean' : statistics.mean(goal_steps) / SIM_RATE,
+                'median' : statistics.median(goal_steps) / SIM_RATE,
+                'p90' : percentile(goal_steps, 0.9) / SIM_RATE,
+            } if goal_steps else None,
+            'mana_collected' : statistics.mean(result['mana_collected'] for result in runs),
+        }
+    return summary
+
+def print_summary(summary):
+    for level, stats in summary.items():
+        print(f"level {level}: {stats['sessions']} sessions, {stats['completion_rate']:.1%} completed, {stats['timeouts']} timed out")
+        deaths = ', '.join(f'{cause} {count}' for cause, count in sorted(stats['deaths'].items())) or 'none'
+        print(f'  deaths: {deaths}')
+        if stats['time_to_goal']:
+            ttg = stats['time_to_goal']
+            print(f"  time to goal: mean {ttg['mean']:.1f}s, median {ttg['median']:.1f}s, p90 {ttg['p90']:.1f}s")
+        print(f"  mana collected: {stats['mana_collected']:.1f} per session")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run headless sessions in parallel and report per-level metrics')
+    parser.add_argument('--levels', type=int, nargs='+', default=[0])
+    parser.add_argument('--sessions', type=int, default=100, help='sessions per level')
+    parser.add_argument('--agent', default='random', help='random, rightward or the path of a route file')
+    parser.add_argument('--seed', type=int, default=0, help='first seed, session i uses seed + i')
+    parser.add_argument('--max-steps', type=int, default=MAX_STEPS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-enemies', action='store_true')
+    parser.add_argument('--out', help='also write every session result and the summary as JSON')
+    args = parser.parse_args()
+
+    sessions = [(level, args.agent, args.seed + i, args.max_steps) for level in args.levels for i in range(args.sessions)]
+    start = time.perf_counter()
+    results = run(sessions, args.workers, args.batch_enemies)
+    elapsed = time.perf_counter() - start
+    steps = sum(result['steps'] for result in results)
+    print(f'{len(results)} sessions, {steps} steps in {elapsed:.1f}s on {args.workers} workers ({steps / elapsed:.0f} steps/s)', file=sys.stderr)
+
+    summary = summarize(results)
+    print_summary(summary)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'summary' : summary, 'sessions' : results}, f, indent=1)
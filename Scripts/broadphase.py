@@ -0,0 +1,71 @@
+import numpy as np
+
+KEY_OFFSET = 1 << 30
+
+class Broadphase:
+    # uniform grid over a set of rects, rebuilt from scratch whenever the set changes (once a frame for moving things).
+    # Items are binned by the cell of their top-left corner, queries widen their range by the largest item instead.
+    def __init__(self, cell_size = 32):
+        self.cell_size = cell_size
+        self.build([], [])
+
+    def __len__(self):
+        return len(self.rects)
+
+    def cell_keys(self, cx, cy):
+        return ((cx + KEY_OFFSET) << 32) | (cy + KEY_OFFSET)
+
+    def build(self, rects, items = None):
+        # rects is anything numpy can turn into an (n, 4) x, y, w, h array, a list of pygame.Rect works.
+        # items optionally keeps the objects the rects belong to, so query results can be mapped back
+        self.items = items
+        self.rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        cs = self.cell_size
+        cx = np.floor_divide(self.rects[:, 0], cs).astype(np.int64)
+        cy = np.floor_divide(self.rects[:, 1], cs).astype(np.int64)
+        keys = self.cell_keys(cx, cy)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.max_w = self.rects[:, 2].max() if len(self.rects) else 0
+        self.max_h = self.rects[:, 3].max() if len(self.rects) else 0
+
+    def query_pairs(self, rects):
+        # every (query index, item index) pair whose rects overlap, sorted by query then item index
+        rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(rects) or not len(self.rects):
+            return empty, empty
+        cs = self.cell_size
+        x0 = np.floor_divide(rects[:, 0] - self.max_w, cs).astype(np.int64)
+        y0 = np.floor_divide(rects[:, 1] - self.max_h, cs).astype(np.int64)
+        nx = np.floor_divide(rects[:, 0] + rects[:, 2], cs).astype(np.int64) - x0 + 1
+        ny = np.floor_divide(rects[:, 1] + rects[:, 3], cs).astype(np.int64) - y0 + 1
+
+        # one entry per (query, cell) the query touches
+        query, local = self.expand(nx * ny)
+        keys = self.cell_keys(x0[query] + local % nx[query], y0[query] + local // nx[query])
+
+        # one entry per (query, item in that cell)
+        lo = np.searchsorted(self.keys, keys, 'left')
+        hi = np.searchsorted(self.keys, keys, 'right')
+        pair, local = self.expand(hi - lo)
+        query = query[pair]
+        item = self.order[lo[pair] + local]
+
+        a = rects[query]
+        b = self.rects[item]
+        hit = (a[:, 0] < b[:, 0] + b[:, 2]) & (a[:, 0] + a[:, 2] > b[:, 0]) & (a[:, 1] < b[:, 1] + b[:, 3]) & (a[:, 1] + a[:, 3] > b[:, 1])
+        query = query[hit]
+        item = item[hit]
+        order = np.lexsort((item, query))
+        return query[order], item[order]
+
+    def query(self, rect):
+        # indices of the items overlapping one rect, in the order they were built
+        return self.query_pairs([rect])[1]
+
+    def expand(self, counts):
+        # for counts [2, 0, 3] returns owners [0, 0, 2, 2, 2] and positions [0, 1, 0, 1, 2]
+        owner = np.repeat(np.arange(len(counts)), counts)
+        starts = np.cumsum(counts) - counts
+        return owner, np.arange(len(owner)) - starts[owner]
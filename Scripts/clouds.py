@@ -10,9 +10,12 @@ class Cloud:
     def update(self):
         self.pos[0] += self.speed
 
-    def render(self, surf, offset = (0,0)):
+    def render_pos(self, surf, offset = (0,0)):
         render_pos = (self.pos[0] - offset[0] * self.depth, self.pos[1] - offset[1] * self.depth)
-        surf.blit(self.img, (render_pos[0] % (surf.get_width() + self.img.get_width()) - self.img.get_width(), render_pos[1] % (surf.get_height() + self.img.get_height()) - self.img.get_height()))
+        return (render_pos[0] % (surf.get_width() + self.img.get_width()) - self.img.get_width(), render_pos[1] % (surf.get_height() + self.img.get_height()) - self.img.get_height())
+
+    def render(self, surf, offset = (0,0)):
+        surf.blit(self.img, self.render_pos(surf, offset))
 
 class Clouds:
     def __init__(self, cloud_images, count=16):
@@ -29,4 +32,12 @@ class Clouds:
 
     def render(self, surf, offset=(0, 0)):
         for cloud in self.clouds:
-            cloud.render(surf, offset=offset)
\ No newline at end of file
+            cloud.render(surf, offset=offset)
+
+    def rects(self, surf, offset=(0, 0)):
+        # where render would draw each cloud, blits land on whole pixels so most steps nothing moves
+        rects = []
+        for cloud in self.clouds:
+            pos = cloud.render_pos(surf, offset)
+            rects.append(cloud.img.get_rect(topleft=(int(pos[0]), int(pos[1]))))
+        return rects
\ No newline at end of file
@@ -0,0 +1,176 @@
+import numpy as np
+
+from Scripts.entities import Slime, Flamemite, DarkMage
+from Scripts.tilemap import DROPDOWN_ID, DROPDOWN_HEIGHT, PHYSICS_LUT
+
+SLIME = 0
+FLAMEMITE = 1
+DARKMAGE = 2
+ENEMY_KINDS = {Slime : SLIME, Flamemite : FLAMEMITE, DarkMage : DARKMAGE}
+
+# the 2x2 tiles starting at the tile under pos cover any enemy up to one tile wide and tall
+CELL_COLS = np.array([[[0, 1]]])
+CELL_ROWS = np.array([[[0], [1]]])
+
+class EnemyBatch:
+    # Runs Slime/Flamemite/DarkMage AI and physics for every enemy at once on NumPy arrays.
+    # Mirrors the per-object update, except that overlapping tiles are resolved against the nearest tile face in one pass.
+    def __init__(self, game, enemies):
+        self.game = game
+        self.enemies = list(enemies)
+        count = len(self.enemies)
+
+        self.pos = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.size = np.zeros((count, 2), dtype=np.int64)
+        self.kind = np.zeros(count, dtype=np.int8)
+        self.flip = np.zeros(count, dtype=bool)
+        self.walking = np.zeros(count, dtype=np.int64)
+        self.attack_cooldown = np.zeros(count, dtype=np.int64)
+        self.hit_wall = np.zeros(count, dtype=bool)  # left/right collision last frame
+        self.alive = np.ones(count, dtype=bool)
+        self.rng = np.random.default_rng(game.rng.getrandbits(64))  # seeded from the game so runs stay reproducible
+
+        for i, enemy in enumerate(self.enemies):
+            self.pos[i] = enemy.pos
+            self.velocity[i] = enemy.velocity
+            self.size[i] = enemy.size
+            self.kind[i] = ENEMY_KINDS[type(enemy)]
+            self.flip[i] = enemy.flip
+            self.walking[i] = enemy.walking
+            self.attack_cooldown[i] = getattr(enemy, 'attack_cooldown', 0)
+
+            # the enemy keeps working as a normal object, its pos/velocity are now views into the batch rows
+            enemy.pos = self.pos[i]
+            enemy.velocity = self.velocity[i]
+            enemy.batch_slot = i
+
+    def snapshot(self):
+        return (self.pos.copy(), self.velocity.copy(), self.flip.copy(), self.walking.copy(), self.attack_cooldown.copy(),
+                self.hit_wall.copy(), self.alive.copy(), self.rng.bit_generator.state)
+
+    def restore(self, snap):
+        # pos and velocity rows are the enemies' own pos/velocity, so they are overwritten in place
+        pos, velocity, flip, walking, attack_cooldown, hit_wall, alive, rng_state = snap
+        self.pos[:] = pos
+        self.velocity[:] = velocity
+        self.flip = flip.copy()
+        self.walking = walking.copy()
+        self.attack_cooldown = attack_cooldown.copy()
+        self.hit_wall = hit_wall.copy()
+        self.alive = alive.copy()
+        self.rng.bit_generator.state = rng_state
+
+    def remove(self, enemy):
+        self.alive[enemy.batch_slot] = False
+
+    def cells(self, tilemap, x, y):
+        ts = tilemap.tile_size
+        cols = (np.floor_divide(x, ts)[:, None, None] + CELL_COLS) * ts
+        rows = (np.floor_divide(y, ts)[:, None, None] + CELL_ROWS) * ts
+        cols, rows = np.broadcast_arrays(cols, rows)
+        return cols, rows, tilemap.types_at(cols, rows)
+
+    def update(self, tilemap):
+        alive = self.alive
+        if not alive.any():
+            return
+        count = len(alive)
+        ts = tilemap.tile_size
+        pos = self.pos
+        velocity = self.velocity
+        w = self.size[:, 0]
+        h = self.size[:, 1]
+
+        # --- AI, the same decisions as Slime/Flamemite/DarkMage.update expressed as masks ---
+        cooling = alive & (self.kind == FLAMEMITE) & (self.attack_cooldown > 0)
+        self.attack_cooldown[cooling] -= 1
+
+        walking = alive & (self.walking > 0)
+        centerx = np.trunc(pos[:, 0]) + w // 2
+        ledge = PHYSICS_LUT[tilemap.types_at(centerx + np.where(self.flip, -7, 7), pos[:, 1] + 23)]
+        moving = walking & ledge & ~self.hit_wall
+        self.flip ^= walking & ~moving
+        movement = np.where(moving, np.where(self.flip, -0.5, 0.5), 0.0)
+        self.walking[walking] -= 1
+
+        stopped = walking & (self.walking == 0)
+        if stopped.any():
+            player = self.game.player
+            dx = player.pos[0] - pos[:, 0]
+            dy = np.abs(player.pos[1] - pos[:, 1])
+            fire = stopped & (dy < 48) & (
+                ((self.kind == FLAMEMITE) & (self.attack_cooldown <= 0) & (np.abs(dx) < 100))
+                | ((self.kind == DARKMAGE) & ((self.flip & (dx < 0)) | (~self.flip & (dx > 0)))))
+            for i in np.flatnonzero(fire):
+                enemy = self.enemies[i]
+                enemy.flip = bool(self.flip[i])
+                enemy.fire()
+                if self.kind[i] == FLAMEMITE:
+                    self.attack_cooldown[i] = 90
+
+        idle = alive & ~walking
+        start = idle & (self.rng.random(count) < 0.01)
+        self.walking[start] = self.rng.integers(30, 121, int(start.sum()))
+
+        # --- physics, PhysicsEntity.update for all enemies ---
+        frame_x = np.where(alive, movement + velocity[:, 0], 0.0)
+        frame_y = np.where(alive, velocity[:, 1], 0.0)
+        velocity[:, 1] = np.minimum(5, velocity[:, 1] + 0.1)
+
+        x = pos[:, 0] + frame_x
+        y = pos[:, 1].copy()
+        rect_x = np.trunc(x)
+        rect_y = np.trunc(y)
+        cols, rows, types = self.cells(tilemap, x, y)
+        hits = PHYSICS_LUT[types] & self.overlap(cols, rows, ts, ts, rect_x, rect_y, w, h) & alive[:, None, None]
+        hit_x = hits.any(axis=(1, 2))
+        left_face = np.where(hits, cols, np.inf).min(axis=(1, 2))
+        right_face = np.where(hits, cols + ts, -np.inf).max(axis=(1, 2))
+        hit_right = hit_x & (frame_x > 0)
+        hit_left = hit_x & (frame_x < 0)
+        rect_x = np.where(hit_right, left_face - w, np.where(hit_left, right_face, rect_x))
+        x = np.where(hit_x, rect_x, x)
+        self.hit_wall = hit_right | hit_left
+
+        y += frame_y
+        rect_y = np.trunc(y)
+        down = np.zeros(count, dtype=bool)
+        falling = frame_y > 0
+        if falling.any():
+            cols, rows, types = self.cells(tilemap, x, y)
+            lands = ((types == DROPDOWN_ID) & self.overlap(cols, rows, ts, DROPDOWN_HEIGHT, rect_x, rect_y, w, h)
+                     & ((rect_y + h - frame_y)[:, None, None] <= rows + 2) & falling[:, None, None])
+            down = lands.any(axis=(1, 2))
+            top = np.where(lands, rows, np.inf).min(axis=(1, 2))
+            rect_y = np.where(down, top - h, rect_y)
+            y = np.where(down, rect_y, y)
+
+        cols, rows, types = self.cells(tilemap, x, y)
+        hits = PHYSICS_LUT[types] & self.overlap(cols, rows, ts, ts, rect_x, rect_y, w, h) & alive[:, None, None]
+        hit_y = hits.any(axis=(1, 2))
+        top_face = np.where(hits, rows, np.inf).min(axis=(1, 2))
+        bottom_face = np.where(hits, rows + ts, -np.inf).max(axis=(1, 2))
+        hit_down = hit_y & (frame_y > 0)
+        hit_up = hit_y & (frame_y < 0)
+        rect_y = np.where(hit_down, top_face - h, np.where(hit_up, bottom_face, rect_y))
+        y = np.where(hit_y, rect_y, y)
+        down |= hit_down
+
+        pos[:, 0] = np.where(alive, x, pos[:, 0])
+        pos[:, 1] = np.where(alive, y, pos[:, 1])
+        self.flip = np.where(movement > 0, False, np.where(movement < 0, True, self.flip))
+        velocity[:, 1] = np.minimum(5, velocity[:, 1] + 0.1)
+        velocity[down | hit_up, 1] = 0
+
+        # --- per object state the renderer and the rest of the game read ---
+        flips = self.flip.tolist()
+        moves = moving.tolist()
+        for i in np.flatnonzero(alive).tolist():
+            enemy = self.enemies[i]
+            enemy.flip = flips[i]
+            enemy.set_action('walk' if moves[i] else 'idle')
+
+    def overlap(self, cols, rows, tile_w, tile_h, rect_x, rect_y, w, h):
+        return ((cols < (rect_x + w)[:, None, None]) & (cols + tile_w > rect_x[:, None, None])
+                & (rows < (rect_y + h)[:, None, None]) & (rows + tile_h > rect_y[:, None, None]))
@@ -1,18 +1,16 @@
 import pygame
-import random
 import math
 
-from Scripts.particle import Particle
-from Scripts.spark import Spark
-
 class PhysicsEntity:
     def __init__(self, game, e_type, pos, size):
         self.game= game
         self.type = e_type
         self.pos = list(pos)
+        self.prev_pos = list(pos)  # position at the start of the current simulation step, for interpolated rendering
         self.size= size 
         self.velocity = [0, 0]
         self.collisions = {"up" : False, "down": False, "right": False, "left": False}
+        self.physics_rect = pygame.Rect(0, 0, size[0], size[1])
 
         self.action =''
         self.anim_offset = (-2 , -2)
@@ -24,20 +22,42 @@ class PhysicsEntity:
 
     def rect(self):
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+
+    def snapshot(self):
+        # attribute values as they are, the containers mutated in place are copied. pos and velocity can be
+        # views into an EnemyBatch, so restore writes them back into the same objects instead of rebinding
+        state = self.__dict__.copy()
+        state['pos'] = tuple(self.pos)
+        state['prev_pos'] = tuple(self.prev_pos)
+        state['velocity'] = tuple(self.velocity)
+        state['collisions'] = self.collisions.copy()
+        return state
+
+    def restore(self, state):
+        pos, prev_pos, velocity, collisions = self.pos, self.prev_pos, self.velocity, self.collisions
+        self.__dict__.update(state)
+        pos[0], pos[1] = state['pos']
+        prev_pos[0], prev_pos[1] = state['prev_pos']
+        velocity[0], velocity[1] = state['velocity']
+        collisions.update(state['collisions'])
+        self.pos, self.prev_pos, self.velocity, self.collisions = pos, prev_pos, velocity, collisions
     
     def set_action(self, action):
         if action != self.action:
            self.action = action
-           self.animation = self.game.assets[self.type + '/' + self.action].copy()
+           self.animation = self.game.assets[self.type + '/' + self.action]
+           self.anim_start = self.game.ticks
 
     def update(self, tilemap, movement = (0,0)):
-        self.collisions = {"up" : False, "down": False, "right": False, "left": False}
+        collisions = self.collisions
+        collisions['up'] = collisions['down'] = collisions['right'] = collisions['left'] = False
         frame_movement = (movement[0] + self.velocity[0], movement[1] + self.velocity[1])
 
         self.velocity[1] = min(5, self.velocity[1] + 0.1)
 
         self.pos[0] += frame_movement[0]
-        entity_rect = self.rect()
+        entity_rect = self.physics_rect
+        entity_rect.update(self.pos[0], self.pos[1], self.size[0], self.size[1])
         for rect in tilemap.physics_rects_around(self.pos):
             if entity_rect.colliderect(rect):
                 if frame_movement[0] > 0:
@@ -49,7 +69,7 @@ class PhysicsEntity:
                 self.pos[0] = entity_rect.x
 
         self.pos[1] += frame_movement[1]
-        entity_rect = self.rect()
+        entity_rect.update(self.pos[0], self.pos[1], self.size[0], self.size[1])
 
         is_dropping = hasattr(self, 'dropping_through') and self.dropping_through > 0
         if frame_movement[1] > 0 and not is_dropping:
@@ -82,11 +102,10 @@ class PhysicsEntity:
         if self.collisions["down"] or self.collisions["up"]: 
             self.velocity[1] = 0
 
-        self.animation.update()
-
             
     def render(self, surf, offset=(0,0)):
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
+        img = self.animation.img(self.game.ticks, self.anim_start)
+        return surf.blit(self.game.sprites.flipped(img) if self.flip else img, (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
         
 
 class Slime(PhysicsEntity):
@@ -98,8 +117,8 @@ class Slime(PhysicsEntity):
 
     def die(self):
         for i in range(15):
-            angle = random.random() * math.pi * 2
-            self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random()))
+            angle = self.game.rng.random() * math.pi * 2
+            self.game.sparks.spawn(self.rect().center, angle, 2 + self.game.rng.random())
 
     def update(self, tilemap, movement =(0,0)):
         if self.walking:
@@ -111,8 +130,8 @@ class Slime(PhysicsEntity):
             else:
                 self.flip = not self.flip
             self.walking = max(0, self.walking - 1)
-        elif random.random() < 0.01:
-            self.walking = random.randint(30,120)
+        elif self.game.rng.random() < 0.01:
+            self.walking = self.game.rng.randint(30,120)
         
 
         super().update(tilemap, movement=movement) 
@@ -134,9 +153,18 @@ class Flamemite(PhysicsEntity):
 
     def die(self):
         for i in range(25):
-            angle = random.random() * math.pi * 2
-            speed = 2 + random.random() * 3
-            self.game.sparks.append(Spark(self.rect().center, angle, 3 + random.random()))
+            angle = self.game.rng.random() * math.pi * 2
+            speed = 2 + self.game.rng.random() * 3
+            self.game.sparks.spawn(self.rect().center, angle, 3 + self.game.rng.random())
+
+    def fire(self):
+        direction = -2.0 if self.flip else 2.0
+        projectile_pos = [self.rect().centerx + (-7 if self.flip else 7), self.rect().centery]
+        self.game.projectiles.spawn(projectile_pos, direction, 20, 'flamemite')
+
+        for i in range(6):
+            self.game.sparks.spawn(projectile_pos, self.game.rng.random() - 0.5 + (math.pi if self.flip else 0), 2 + self.game.rng.random())
+        self.attack_cooldown = 90
 
     def update(self, tilemap, movement =(0,0)):
 
@@ -156,15 +184,10 @@ class Flamemite(PhysicsEntity):
             if not self.walking and self.attack_cooldown <=0:
                 dis = (self.game.player.pos[0] - self.pos[0], self.game.player.pos[1] - self.pos[1])
                 if abs(dis[1]) < 48 and abs(dis[0]) < 100:
-                    direction = -2.0 if self.flip else 2.0
-                    self.game.projectiles.append([[self.rect().centerx + (-7 if self.flip else 7), self.rect().centery], direction, 0, 20, 'flamemite'])
-
-                    for i in range(6):
-                        self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + (math.pi if self.flip else 0), 2 + random.random()))
-                        self.attack_cooldown = 90
+                    self.fire()
 
-        elif random.random() < 0.01:
-            self.walking = random.randint(30,120)
+        elif self.game.rng.random() < 0.01:
+            self.walking = self.game.rng.randint(30,120)
 
 
         super().update(tilemap, movement=movement) 
@@ -185,8 +208,20 @@ class DarkMage(PhysicsEntity):
 
     def die(self):
         for i in range(40):
-            angle = random.random() * math.pi * 2
-            self.game.sparks.append(Spark(self.rect().center, angle, 3 + random.random() * 2))
+            angle = self.game.rng.random() * math.pi * 2
+            self.game.sparks.spawn(self.rect().center, angle, 3 + self.game.rng.random() * 2)
+
+    def fire(self):
+        if self.flip:
+            projectile_pos = [self.rect().centerx - 7, self.rect().centery]
+            self.game.projectiles.spawn(projectile_pos, -1.5, 15, 'darkmage')
+            for i in range(4):
+                self.game.sparks.spawn(projectile_pos, self.game.rng.random() - 0.5 + math.pi, 2 + self.game.rng.random())
+        else:
+            projectile_pos = [self.rect().centerx + 7, self.rect().centery]
+            self.game.projectiles.spawn(projectile_pos, 1.5, 15, 'darkmage')
+            for i in range(4):
+                self.game.sparks.spawn(projectile_pos, self.game.rng.random() - 0.5 , 2 + self.game.rng.random())
     
     def update(self, tilemap, movement =(0,0)):
         if self.walking:
@@ -202,18 +237,11 @@ class DarkMage(PhysicsEntity):
             if not self.walking:
                 dis = (self.game.player.pos[0] - self.pos[0], self.game.player.pos[1] - self.pos[1])    
                 if (abs(dis[1])<48):   #48 pixels distance is taken  
-                    if (self.flip and dis[0] < 0):
-                        self.game.projectiles.append([[self.rect().centerx - 7, self.rect().centery], -1.5, 0, 15, 'darkmage'])
-                        for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random()))
-
-                    if (not self.flip and dis[0] > 0):
-                        self.game.projectiles.append([[self.rect().centerx + 7, self.rect().centery], 1.5, 0, 15, 'darkmage'])
-                        for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 , 2 + random.random()))
+                    if (self.flip and dis[0] < 0) or (not self.flip and dis[0] > 0):
+                        self.fire()
 
-        elif random.random() < 0.01:
-            self.walking = random.randint(30,120)
+        elif self.game.rng.random() < 0.01:
+            self.walking = self.game.rng.randint(30,120)
 
 
         super().update(tilemap, movement=movement) 
@@ -241,6 +269,8 @@ class Player(PhysicsEntity):
         self.max_hp = 120
         self.invincibility = 0  # 1.5s immunity
         self.dead = False
+        self.death_cause = None  # 'enemy', 'projectile' or 'hazard'
+        self.mana_collected = 0  # pickups taken, for batch run statistics
 
         self.b_attack_cost = 20
         self.C_attack_cost = 100
@@ -252,32 +282,34 @@ class Player(PhysicsEntity):
 
         self.dropping_through = 0
 
-    def take_damage(self, amount):
+    def take_damage(self, amount, cause = 'enemy'):
         if self.invincibility > 0 or self.dead:
             return False
         self.hp -= amount
         self.invincibility = 60
 
         for i in range(15):
-            angle = random.random() * math.pi * 2
-            self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random()))
+            angle = self.game.rng.random() * math.pi * 2
+            self.game.sparks.spawn(self.rect().center, angle, 2 + self.game.rng.random())
 
         if self.hp <= 0:
             self.hp = 0
-            self.die()
+            self.die(cause)
             return True
         return False
     
 
-    def die(self):
+    def die(self, cause = 'hazard'):
 
         self.dead = True
+        self.death_cause = cause
 
         for i in range(40):
-            angle = random.random() * math.pi * 2
-            self.game.sparks.append(Spark(self.rect().center, angle, 3 + random.random()))
+            angle = self.game.rng.random() * math.pi * 2
+            self.game.sparks.spawn(self.rect().center, angle, 3 + self.game.rng.random())
 
     def collect_mana(self, amount):
+        self.mana_collected += 1
         self.mana = min(self.mana + amount, self.max_mana)
         return self.mana >= self.max_mana
 
@@ -344,10 +376,10 @@ class Player(PhysicsEntity):
 
             projectile_pos = [self.rect().centerx + (-7 if self.flip else 7), self.rect().centery]
 
-            self.game.projectiles.append([projectile_pos, direction, 0, self.b_attack_dmg, 'player_basic'])
+            self.game.projectiles.spawn(projectile_pos, direction, self.b_attack_dmg, 'player_basic')
 
             for i in range(4):
-                self.game.sparks.append(Spark(projectile_pos, random.random() - 0.5 + (math.pi if self.flip else 0), 2 + random.random()))
+                self.game.sparks.spawn(projectile_pos, self.game.rng.random() - 0.5 + (math.pi if self.flip else 0), 2 + self.game.rng.random())
 
             self.attacking = 36 # Lock player for 6 frames * 6 img_dur
             return True
@@ -366,10 +398,10 @@ class Player(PhysicsEntity):
             
             projectile_pos = [self.rect().centerx + (-7 if self.flip else 7), self.rect().centery]
 
-            self.game.projectiles.append([projectile_pos, direction, 0, self.C_attack_dmg, 'player_strong'])
+            self.game.projectiles.spawn(projectile_pos, direction, self.C_attack_dmg, 'player_strong')
 
             for i in range(12):
-                self.game.sparks.append(Spark(projectile_pos, random.random() - 0.5 + (math.pi if self.flip else 0), 3 + random.random()))
+                self.game.sparks.spawn(projectile_pos, self.game.rng.random() - 0.5 + (math.pi if self.flip else 0), 3 + self.game.rng.random())
             
             self.attacking = 36
             return True
@@ -381,7 +413,7 @@ class Player(PhysicsEntity):
 
             staff_pos = [self.rect().centerx + (-7 if self.flip else 7), self.rect().centery]
             for i in range(3):
-                self.game.sparks.append(Spark(staff_pos, random.random() * math.pi * 2, 0.5 + random.random() * 0.5))
+                self.game.sparks.spawn(staff_pos, self.game.rng.random() * math.pi * 2, 0.5 + self.game.rng.random() * 0.5)
             
             self.attacking = 24 #penalty for not noticing
     
@@ -473,7 +505,7 @@ class Player(PhysicsEntity):
         if self.invincibility > 0 and self.invincibility % 4 < 2 and self.dashing == 0: #For flickering effect
             return
 
-        super().render(surf, offset = offset)
+        return super().render(surf, offset = offset)
 
         
 
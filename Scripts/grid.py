@@ -0,0 +1,144 @@
+from array import array
+
+import numpy as np
+
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT  # 16x16 tiles per chunk
+CHUNK_MASK = CHUNK_SIZE - 1
+CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
+
+# id 0 is reserved for "no tile", so ids fit in a byte next to the variant
+TILE_TYPES = [None, 'Grass', 'Stone', 'Halfblock', 'Mana', 'Spawner', 'Lava', 'Hazards', 'DropDown', 'Temp', 'Wall', 'Goal', 'Decor']
+TILE_IDS = {name: i for i, name in enumerate(TILE_TYPES) if name}
+
+def tile_id(name):
+    if name not in TILE_IDS:
+        TILE_IDS[name] = len(TILE_TYPES)
+        TILE_TYPES.append(name)
+    return TILE_IDS[name]
+
+def chunk_index(x, y):
+    return ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+
+class Chunk:
+    __slots__ = ('types', 'variants', 'order', 'count')
+
+    def __init__(self, types = None, variants = None, order = None, count = 0):
+        # types/variants/order may be read-only views into a mapped map file until first write
+        self.types = bytearray(CHUNK_AREA) if types is None else types
+        self.variants = bytearray(CHUNK_AREA) if variants is None else variants
+        self.order = array('I', bytes(4 * CHUNK_AREA)) if order is None else order  # when each cell was filled, see TileGrid.__iter__
+        self.count = count
+
+    def writable(self):
+        if type(self.types) is not bytearray:
+            self.types = bytearray(self.types)
+        if type(self.variants) is not bytearray:
+            self.variants = bytearray(self.variants)
+        if type(self.order) is not array:
+            self.order = array('I', bytes(self.order))
+        return self
+
+class TileGrid:
+    def __init__(self):
+        self.chunks = {}
+        self.count = 0
+        self.next_order = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, loc):
+        return self.get(loc[0], loc[1]) != 0
+
+    def get(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return 0
+        return chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def get_variant(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return 0
+        return chunk.variants[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def set(self, x, y, tid, variant):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk()
+        chunk.writable()
+        i = chunk_index(x, y)
+        if not chunk.types[i]:
+            chunk.count += 1
+            self.count += 1
+            chunk.order[i] = self.next_order
+            self.next_order += 1
+        chunk.types[i] = tid
+        chunk.variants[i] = variant
+
+    def set_variant(self, x, y, variant):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is not None:
+            chunk.writable().variants[chunk_index(x, y)] = variant
+
+    def remove(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return False
+        i = chunk_index(x, y)
+        if not chunk.types[i]:
+            return False
+        chunk.writable()
+        chunk.types[i] = 0
+        chunk.variants[i] = 0
+        chunk.count -= 1
+        self.count -= 1
+        if not chunk.count:
+            del self.chunks[key]
+        return True
+
+    def clear(self):
+        self.chunks = {}
+        self.count = 0
+        self.next_order = 0
+
+    def load_chunks(self, chunks, next_order):
+        self.chunks = chunks
+        self.count = sum(chunk.count for chunk in chunks.values())
+        self.next_order = next_order
+
+    def dense(self):
+        # the whole grid as one (rows, cols) array of tile ids, plus the tile coordinates of its top-left cell
+        if not self.chunks:
+            return np.zeros((0, 0), dtype=np.uint8), 0, 0
+        min_cx = min(key[0] for key in self.chunks)
+        min_cy = min(key[1] for key in self.chunks)
+        width = (max(key[0] for key in self.chunks) - min_cx + 1) * CHUNK_SIZE
+        height = (max(key[1] for key in self.chunks) - min_cy + 1) * CHUNK_SIZE
+        types = np.zeros((height, width), dtype=np.uint8)
+        for (cx, cy), chunk in self.chunks.items():
+            x = (cx - min_cx) * CHUNK_SIZE
+            y = (cy - min_cy) * CHUNK_SIZE
+            types[y:y + CHUNK_SIZE, x:x + CHUNK_SIZE] = np.frombuffer(chunk.types, dtype=np.uint8).reshape(CHUNK_SIZE, CHUNK_SIZE)
+        return types, min_cx * CHUNK_SIZE, min_cy * CHUNK_SIZE
+
+    def __iter__(self):
+        # yields (x, y, tile id, variant) for every occupied cell in the order the cells were first filled, which is
+        # the order of the map file. Spawners, pickups and goals are extracted in it, so enemy update and draw order
+        # don't depend on where chunks happen to be.
+        cells = []
+        for (cx, cy), chunk in self.chunks.items():
+            types = chunk.types
+            variants = chunk.variants
+            order = chunk.order
+            base_x = cx << CHUNK_SHIFT
+            base_y = cy << CHUNK_SHIFT
+            for i in range(CHUNK_AREA):
+                if types[i]:
+                    cells.append((order[i], base_x + (i & CHUNK_MASK), base_y + (i >> CHUNK_SHIFT), types[i], variants[i]))
+        cells.sort()
+        for cell in cells:
+            yield cell[1:]
@@ -1,10 +1,37 @@
 import pygame
 import math
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 64  # rendered strings kept, the least recently drawn one goes first
+LAYER_KEY = (255, 0, 255)  # colorkey of the HUD layer, no HUD element is drawn in it
+
+class TextCache:
+    # font.render results keyed by (font, text, color). HUD strings barely ever change, so almost every lookup is a hit.
+    def __init__(self, size = TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, tuple(color))
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = font.render(text, False, color)
+            self.surfaces[key] = surf
+            if len(self.surfaces) > self.size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surf
 
 class HUD:
     
     def __init__(self, game):
         self.game = game
+        self.texts = TextCache()
+        self.layer = None  # bars and text composed once, redrawn only when what they show changes
+        self.layer_state = None
+        self.layer_rects = []
+        self.overlays = {}  # (size, color, alpha) -> death / victory screen tint
         
         
         self.hp_bar_color = (220, 50, 50)  
@@ -51,20 +78,20 @@ class HUD:
         pygame.draw.rect(surf, self.border_color, bg_rect, self.bar_border)
         
         if label:
-            label_surf = self.font.render(label, False, self.text_color)
+            label_surf = self.texts.render(self.font, label, self.text_color)
             label_x = x - label_surf.get_width() - 4
             label_y = y + (self.bar_height - label_surf.get_height()) // 2
             
-            shadow_surf = self.font.render(label, False, self.shadow_color)
+            shadow_surf = self.texts.render(self.font, label, self.shadow_color)
             surf.blit(shadow_surf, (label_x + 1, label_y + 1))
             surf.blit(label_surf, (label_x, label_y))
         
         value_text = f"{int(current)}/{int(maximum)}"
-        value_surf = self.font.render(value_text, False, self.text_color)
+        value_surf = self.texts.render(self.font, value_text, self.text_color)
         value_x = x + self.bar_width + 4
         value_y = y + (self.bar_height - value_surf.get_height()) // 2
         
-        shadow_surf = self.font.render(value_text, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.font, value_text, self.shadow_color)
         surf.blit(shadow_surf, (value_x + 1, value_y + 1))
         surf.blit(value_surf, (value_x, value_y))
     
@@ -75,12 +102,65 @@ class HUD:
         if color is None:
             color = self.text_color
         
-        shadow_surf = font.render(str(text), False, self.shadow_color)
+        shadow_surf = self.texts.render(font, str(text), self.shadow_color)
         surf.blit(shadow_surf, (x + 1, y + 1))
     
-        text_surf = font.render(str(text), False, color)
+        text_surf = self.texts.render(font, str(text), color)
         surf.blit(text_surf, (x, y))
     
+    def state(self):
+        # everything the layer shows, as it is shown: the dash cooldown only matters once its second changes
+        player = self.game.player
+        boss = self.game.boss
+        return (player.hp, player.max_hp, player.mana, player.max_mana,
+                None if player.dash_cd <= 0 else player.dash_cd // 60, player.can_cast(player.b_attack_cost), player.can_cast(player.C_attack_cost),
+                self.game.current_level, boss.health if boss and boss in self.game.enemies else None)
+
+    def refresh(self, size):
+        # redraws the layer if what it shows changed, returns whether it did
+        state = self.state()
+        if self.layer is None or self.layer.get_size() != size:
+            self.layer = pygame.Surface(size)
+            self.layer.set_colorkey(LAYER_KEY)
+            self.layer_state = None
+        if state == self.layer_state:
+            return False
+        self.layer.fill(LAYER_KEY)
+        if state[-1] is not None:
+            self.render_boss_health(self.layer, self.game.boss, "DARK MAGE")
+        self.render(self.layer)
+        self.render_ability_indicators(self.layer)
+        self.layer_state = state
+        # only the parts of the layer with something on them are blitted, the top bars and the bottom text
+        half = size[1] // 2
+        self.layer_rects = []
+        for area in (pygame.Rect(0, 0, size[0], half), pygame.Rect(0, half, size[0], size[1] - half)):
+            rect = self.layer.subsurface(area).get_bounding_rect().move(area.topleft)
+            if rect.width and rect.height:
+                self.layer_rects.append(rect)
+        return True
+
+    def draw(self, surf):
+        self.refresh(surf.get_size())
+        for rect in self.layer_rects:
+            surf.blit(self.layer, rect, rect)
+
+    def draw_over(self, surf, areas):
+        # the layer only where it overlaps areas, for the dirty rect renderer. refresh first.
+        for rect in self.layer_rects:
+            for i in rect.collidelistall(areas):
+                clip = rect.clip(areas[i])
+                surf.blit(self.layer, clip, clip)
+
+    def overlay(self, size, color, alpha):
+        key = (size, color, alpha)
+        if key not in self.overlays:
+            overlay = pygame.Surface(size)
+            overlay.set_alpha(alpha)
+            overlay.fill(color)
+            self.overlays[key] = overlay
+        return self.overlays[key]
+
     def render(self, surf):
         
         player = self.game.player
@@ -99,10 +179,10 @@ class HUD:
         level_x = surf.get_width() - self.padding_x
         level_y = self.padding_y
         
-        level_surf = self.large_font.render(level_text, False, self.text_color)
+        level_surf = self.texts.render(self.large_font, level_text, self.text_color)
         level_x -= level_surf.get_width()
         
-        shadow_surf = self.large_font.render(level_text, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.large_font, level_text, self.shadow_color)
         surf.blit(shadow_surf, (level_x + 1, level_y + 1))
         surf.blit(level_surf, (level_x, level_y))
     
@@ -114,11 +194,11 @@ class HUD:
         x = (surf.get_width() - boss_bar_width) // 2
         y = 20
         
-        name_surf = self.large_font.render(boss_name, False, self.text_color)
+        name_surf = self.texts.render(self.large_font, boss_name, self.text_color)
         name_x = x + (boss_bar_width - name_surf.get_width()) // 2
         name_y = y - 14
         
-        shadow_surf = self.large_font.render(boss_name, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.large_font, boss_name, self.shadow_color)
         surf.blit(shadow_surf, (name_x + 1, name_y + 1))
         surf.blit(name_surf, (name_x, name_y))
         
@@ -137,11 +217,11 @@ class HUD:
         pygame.draw.rect(surf, self.border_color, bg_rect, 2)
         
         health_text = f"{int(enemy.health)}/{max_health}"
-        health_surf = self.font.render(health_text, False, self.text_color)
+        health_surf = self.texts.render(self.font, health_text, self.text_color)
         health_x = x + (boss_bar_width - health_surf.get_width()) // 2
         health_y = y + boss_bar_height + 2
         
-        shadow_surf = self.font.render(health_text, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.font, health_text, self.shadow_color)
         surf.blit(shadow_surf, (health_x + 1, health_y + 1))
         surf.blit(health_surf, (health_x, health_y))
     
@@ -174,22 +254,19 @@ class HUD:
     
     def render_death_screen(self, surf):
 
-        overlay = pygame.Surface(surf.get_size())
-        overlay.set_alpha(180)
-        overlay.fill((50, 0, 0))
-        surf.blit(overlay, (0, 0))
+        surf.blit(self.overlay(surf.get_size(), (50, 0, 0), 180), (0, 0))
         
         death_text = "YOU DIED"
-        death_surf = self.huge_font.render(death_text, False, (255, 100, 100))
+        death_surf = self.texts.render(self.huge_font, death_text, (255, 100, 100))
         death_x = (surf.get_width() - death_surf.get_width()) // 2
         death_y = (surf.get_height() - death_surf.get_height()) // 2 - 10
         
-        shadow_surf = self.huge_font.render(death_text, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.huge_font, death_text, self.shadow_color)
         surf.blit(shadow_surf, (death_x + 2, death_y + 2))
         surf.blit(death_surf, (death_x, death_y))
         
         respawn_text = "Respawning..."
-        respawn_surf = self.large_font.render(respawn_text, False, self.text_color)
+        respawn_surf = self.texts.render(self.large_font, respawn_text, self.text_color)
         respawn_x = (surf.get_width() - respawn_surf.get_width()) // 2
         respawn_y = death_y + 20
         
@@ -197,16 +274,13 @@ class HUD:
     
     def render_victory_screen(self, surf):
         
-        overlay = pygame.Surface(surf.get_size())
-        overlay.set_alpha(150)
-        overlay.fill((0, 50, 0))
-        surf.blit(overlay, (0, 0))
+        surf.blit(self.overlay(surf.get_size(), (0, 50, 0), 150), (0, 0))
         
         victory_text = "LEVEL COMPLETE!"
-        victory_surf = self.huge_font.render(victory_text, False, (100, 255, 100))
+        victory_surf = self.texts.render(self.huge_font, victory_text, (100, 255, 100))
         victory_x = (surf.get_width() - victory_surf.get_width()) // 2
         victory_y = (surf.get_height() - victory_surf.get_height()) // 2
         
-        shadow_surf = self.huge_font.render(victory_text, False, self.shadow_color)
+        shadow_surf = self.texts.render(self.huge_font, victory_text, self.shadow_color)
         surf.blit(shadow_surf, (victory_x + 2, victory_y + 2))
         surf.blit(victory_surf, (victory_x, victory_y))
@@ -0,0 +1,111 @@
+import mmap
+import os
+import struct
+import sys
+
+from Scripts.grid import Chunk, TILE_TYPES, tile_id, CHUNK_AREA
+
+# Binary level layout (little endian):
+#   header   : magic, version, tile_size, type count, chunk count, offgrid count, next fill order
+#   types    : per type id (starting at 1) a length-prefixed utf-8 name
+#   chunks   : fixed size records -> cx, cy, tile count, types[CHUNK_AREA], variants[CHUNK_AREA], order[CHUNK_AREA] (uint32)
+#   offgrid  : fixed size records -> type id, variant, x, y
+# Chunk records are raw byte arrays so a mapped file can back the grid directly.
+
+MAGIC = b'MMAP'
+VERSION = 1
+MAP_EXT = '.map'
+
+HEADER = struct.Struct('<4sHHHIII')
+CHUNK_HEADER = struct.Struct('<iiH')
+CHUNK_RECORD = CHUNK_HEADER.size + 6 * CHUNK_AREA
+OFFGRID_RECORD = struct.Struct('<BBdd')
+
+def write_map(path, grid, tile_size, offgrid_tiles):
+    used = {tid for chunk in grid.chunks.values() for tid in set(chunk.types) if tid}
+    used.update(tile_id(tile['type']) for tile in offgrid_tiles)
+    type_count = max(used, default=0)
+
+    out = [HEADER.pack(MAGIC, VERSION, tile_size, type_count, len(grid.chunks), len(offgrid_tiles), grid.next_order)]
+    for tid in range(1, type_count + 1):
+        name = TILE_TYPES[tid].encode('utf-8')
+        out.append(bytes([len(name)]) + name)
+
+    for (cx, cy), chunk in grid.chunks.items():
+        out.append(CHUNK_HEADER.pack(cx, cy, chunk.count))
+        out.append(bytes(chunk.types))
+        out.append(bytes(chunk.variants))
+        out.append(bytes(chunk.order))
+
+    for tile in offgrid_tiles:
+        out.append(OFFGRID_RECORD.pack(tile_id(tile['type']), tile['variant'], tile['pos'][0], tile['pos'][1]))
+
+    # written next to the target and swapped in: a process reading the old file keeps its mapping intact,
+    # truncating a mapped file in place makes its views read past the end of the file (SIGBUS)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    f = open(tmp, 'wb')
+    f.write(b''.join(out))
+    f.close()
+    os.replace(tmp, path)
+
+def is_current(path):
+    # False for files written in another version, which the game then skips in favour of the json map
+    f = open(path, 'rb')
+    header = f.read(HEADER.size)
+    f.close()
+    return len(header) == HEADER.size and HEADER.unpack(header)[:2] == (MAGIC, VERSION)
+
+def read_map(path):
+    f = open(path, 'rb')
+    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    f.close()
+
+    magic, version, tile_size, type_count, chunk_count, offgrid_count, next_order = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(path + ' is not a binary map')
+    if version != VERSION:
+        raise ValueError(path + ' has unsupported map version ' + str(version))
+
+    # file type ids -> ids of this process, identical unless new types were registered in between
+    remap = bytearray(range(256))
+    at = HEADER.size
+    for file_tid in range(1, type_count + 1):
+        length = data[at]
+        remap[file_tid] = tile_id(bytes(data[at + 1:at + 1 + length]).decode('utf-8'))
+        at += 1 + length
+    identity = remap == bytearray(range(256))
+
+    chunks = {}
+    for _ in range(chunk_count):
+        cx, cy, count = CHUNK_HEADER.unpack_from(data, at)
+        at += CHUNK_HEADER.size
+        types = data[at:at + CHUNK_AREA]
+        variants = data[at + CHUNK_AREA:at + 2 * CHUNK_AREA]
+        order = data[at + 2 * CHUNK_AREA:at + 6 * CHUNK_AREA].cast('I')
+        at += 6 * CHUNK_AREA
+        if not identity:
+            types = bytearray(bytes(types).translate(remap))
+        chunks[(cx, cy)] = Chunk(types, variants, order, count)
+
+    offgrid_tiles = []
+    for _ in range(offgrid_count):
+        tid, variant, x, y = OFFGRID_RECORD.unpack_from(data, at)
+        at += OFFGRID_RECORD.size
+        offgrid_tiles.append({'type' : TILE_TYPES[remap[tid]], 'variant' : variant, 'pos' : [x, y]})
+
+    return tile_size, chunks, next_order, offgrid_tiles
+
+def convert(json_path):
+    # imported here, tilemap itself imports this module
+    from Scripts.tilemap import Tilemap
+
+    tilemap = Tilemap(None)
+    tilemap.load(json_path)
+    out_path = json_path[:-len('.json')] + MAP_EXT if json_path.endswith('.json') else json_path + MAP_EXT
+    tilemap.save(out_path)
+    return out_path
+
+if __name__ == '__main__':
+    # python -m Scripts.mapformat Maps/*.json
+    for path in sys.argv[1:]:
+        print(path, '->', convert(path))
@@ -0,0 +1,75 @@
+class OffgridIndex:
+    # spatial hash of offgrid tiles, handles increase with insertion so results keep the placement (draw) order
+    def __init__(self, cell_size = 64):
+        self.cell_size = cell_size
+        self.entries = {}   # handle -> (tile, x, y, w, h)
+        self.handles = {}   # id(tile) -> handle
+        self.cells = {}     # (cx, cy) -> set of handles
+        self.next_handle = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for entry in list(self.entries.values()):
+            yield entry[0]
+
+    def cell_range(self, x, y, w, h):
+        cs = self.cell_size
+        for cx in range(int(x // cs), int((x + w) // cs) + 1):
+            for cy in range(int(y // cs), int((y + h) // cs) + 1):
+                yield (cx, cy)
+
+    def add(self, tile, size):
+        handle = self.next_handle
+        self.next_handle += 1
+        x, y = tile['pos'][0], tile['pos'][1]
+        self.entries[handle] = (tile, x, y, size[0], size[1])
+        self.handles[id(tile)] = handle
+        for key in self.cell_range(x, y, size[0], size[1]):
+            self.cells.setdefault(key, set()).add(handle)
+        return tile
+
+    def remove(self, tile):
+        handle = self.handles.pop(id(tile), None)
+        if handle is None:
+            return False
+        _, x, y, w, h = self.entries.pop(handle)
+        for key in self.cell_range(x, y, w, h):
+            cell = self.cells[key]
+            cell.discard(handle)
+            if not cell:
+                del self.cells[key]
+        return True
+
+    def clear(self):
+        self.entries = {}
+        self.handles = {}
+        self.cells = {}
+
+    def query_rect(self, x, y, w, h):
+        found = set()
+        for key in self.cell_range(x, y, w, h):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+
+        tiles = []
+        for handle in sorted(found):
+            tile, tx, ty, tw, th = self.entries[handle]
+            if tx < x + w and tx + tw > x and ty < y + h and ty + th > y:
+                tiles.append(tile)
+        return tiles
+
+    def query_point(self, pos):
+        cs = self.cell_size
+        cell = self.cells.get((int(pos[0] // cs), int(pos[1] // cs)))
+        if not cell:
+            return []
+
+        tiles = []
+        for handle in sorted(cell):
+            tile, tx, ty, tw, th = self.entries[handle]
+            if tx <= pos[0] < tx + tw and ty <= pos[1] < ty + th:
+                tiles.append(tile)
+        return tiles
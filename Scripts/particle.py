@@ -1,25 +1,110 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0,0], frame=0):
-        self.game = game
-        self.type = p_type
-        self.pos =list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets[p_type].copy()
-        self.animation.frame = frame
-    
+import numpy as np
+
+# per type behaviour as data: sway adds sin(frame * freq) * amp to x every frame
+PARTICLE_BEHAVIOURS = {
+    'Flames' : {'sway' : (0.035, 0.3)},
+}
+
+class Particles:
+    # fixed number of slots, live particles packed at the front. Spawns past capacity are dropped (and counted),
+    # existing particles are never cut short to make room.
+    def __init__(self, game, types, capacity = 1024):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.int16)
+
+        # shared frame tables: frame counter -> (image, half width, half height), built once per type from its Animation
+        self.type_ids = {}
+        self.frames = []
+        last = []
+        loop = []
+        sway = []
+        for p_type in types:
+            animation = game.assets[p_type]
+            self.type_ids[p_type] = len(self.frames)
+            self.frames.append([(img, img.get_width() // 2, img.get_height() // 2) for img in animation.images for _ in range(animation.img_duration)])
+            last.append(animation.img_duration * len(animation.images) - 1)
+            loop.append(animation.loop)
+            sway.append(PARTICLE_BEHAVIOURS.get(p_type, {}).get('sway', (0, 0)))
+        self.last = np.array(last, dtype=np.int32)
+        self.loop = np.array(loop, dtype=bool)
+        self.sway = np.array(sway, dtype=np.float64).reshape(-1, 2)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def snapshot(self):
+        n = self.count
+        return n, self.pos[:n].copy(), self.velocity[:n].copy(), self.frame[:n].copy(), self.kind[:n].copy()
+
+    def restore(self, snap):
+        n = self.count = snap[0]
+        self.pos[:n] = snap[1]
+        self.velocity[:n] = snap[2]
+        self.frame[:n] = snap[3]
+        self.kind[:n] = snap[4]
+
+    def spawn(self, p_type, pos, velocity=(0, 0), frame=0):
+        if self.count >= self.capacity:
+            self.dropped += 1
+            return False
+        i = self.count
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = frame
+        self.kind[i] = self.type_ids[p_type]
+        self.count += 1
+        return True
+
     def update(self):
-        kill = False
+        n = self.count
+        kind = self.kind[:n]
+        last = self.last[kind]
+
+        # a one-shot particle shows its last frame for one extra update before it is dropped
+        alive = self.loop[kind] | (self.frame[:n] <= last)
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            n = self.count = len(keep)
+            self.pos[:n] = self.pos[keep]
+            self.velocity[:n] = self.velocity[keep]
+            self.frame[:n] = self.frame[keep]
+            self.kind[:n] = self.kind[keep]
+            kind = self.kind[:n]
+            last = self.last[kind]
+        if not n:
+            return
 
-        if self.animation.done:
-            kill = True
+        self.pos[:n] += self.velocity[:n]
+        frame = self.frame[:n]
+        frame += 1
+        looping = self.loop[kind]
+        frame[looping] %= last[looping] + 1
 
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+        sway = self.sway[kind]
+        swaying = sway[:, 1] != 0
+        if swaying.any():
+            self.pos[:n, 0][swaying] += np.sin(frame[swaying] * sway[swaying, 0]) * sway[swaying, 1]
 
-        self.animation.update()
-        return kill
-    
-    def render(self, surf, offset = (0,0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
-        
\ No newline at end of file
+    def render(self, surf, offset = (0,0), rects = False):
+        # rects=True returns the area of every blit, for the dirty rect renderer
+        n = self.count
+        if not n:
+            return []
+        kinds = self.kind[:n].tolist()
+        frames = np.minimum(self.frame[:n], self.last[self.kind[:n]]).tolist()
+        xs = (self.pos[:n, 0] - offset[0]).tolist()
+        ys = (self.pos[:n, 1] - offset[1]).tolist()
+        tables = self.frames
+        blits = []
+        for i in range(n):
+            img, half_w, half_h = tables[kinds[i]][frames[i]]
+            blits.append((img, (xs[i] - half_w, ys[i] - half_h)))
+        return surf.blits(blits, doreturn=rects)
@@ -0,0 +1,152 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+# Decoded images are kept on disk as raw RGBA, named after a hash of the source file's bytes, and an index maps
+# each source path to its mtime, size and hash. A later launch whose sources still match the index reads each
+# image back with a single read, without opening the source or running the PNG/JPEG decoder. A source that
+# was touched is hashed again, so it only gets decoded if its bytes actually changed.
+# Saving the index drops entries whose source changed or is gone, and deletes the pixel files nobody points at.
+
+CACHE_DIR = '.cache/pixels'
+INDEX_FILE = 'index.json'
+MAGIC = b'RGBA'
+HEADER = struct.Struct('<4sII')  # magic, width, height, then width * height * 4 bytes
+
+cache_dir = CACHE_DIR
+hits = 0
+misses = 0
+stats_lock = threading.Lock()
+
+index = None  # source path -> [mtime_ns, size, hash] for cache_dir, read on first use
+index_dir = None
+index_dirty = False
+index_lock = threading.Lock()
+
+def reset_stats():
+    global hits, misses
+    hits = misses = 0
+
+def reset():
+    # forget everything held in memory, the next load starts from what is on disk
+    global index, index_dir
+    save_index()
+    reset_stats()
+    index = index_dir = None
+
+def stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def read_index():
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_index():
+    # call with index_lock held
+    global index, index_dir
+    if index is None or index_dir != cache_dir:
+        index = read_index()
+        index_dir = cache_dir
+    return index
+
+def save_index():
+    global index_dirty
+    with index_lock:
+        if not index_dirty or index_dir != cache_dir:
+            return
+        # merged with what other processes saved since we read it
+        entries = read_index()
+        entries.update(index)
+        for path in list(entries):
+            try:
+                current = stamp(path) == entries[path][:2]
+            except OSError:
+                current = False
+            if not current:
+                del entries[path]
+
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, INDEX_FILE)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+        index_dirty = False
+
+        used = {entry[2] + '.rgba' for entry in entries.values()}
+        for name in os.listdir(cache_dir):
+            if name.endswith('.rgba') and name not in used:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+atexit.register(save_index)
+
+def read_cached(digest):
+    try:
+        with open(os.path.join(cache_dir, digest + '.rgba'), 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if len(raw) < HEADER.size:
+        return None
+    magic, w, h = HEADER.unpack_from(raw)
+    if magic != MAGIC or len(raw) != HEADER.size + w * h * 4:
+        return None
+    return pygame.image.frombuffer(memoryview(raw)[HEADER.size:], (w, h), 'RGBA')
+
+def load(path):
+    # returns an unconverted surface, convert_alpha() it on the main thread
+    global hits, misses, index_dirty
+    key = stamp(path)
+    with index_lock:
+        entry = get_index().get(path)
+    if entry is not None and entry[:2] == key:
+        surf = read_cached(entry[2])
+        if surf is not None:
+            with stats_lock:
+                hits += 1
+            return surf
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    surf = read_cached(digest)
+    if surf is None:
+        with stats_lock:
+            misses += 1
+        surf = pygame.image.load(io.BytesIO(data), os.path.basename(path))
+        os.makedirs(cache_dir, exist_ok=True)
+        cached = os.path.join(cache_dir, digest + '.rgba')
+        tmp = f'{cached}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, surf.get_width(), surf.get_height()))
+            f.write(pygame.image.tobytes(surf, 'RGBA'))
+        os.replace(tmp, cached)
+    else:
+        with stats_lock:
+            hits += 1
+
+    with index_lock:
+        get_index()[path] = key + [digest]
+        index_dirty = True
+    return surf
+
+def load_many(paths, workers = None):
+    # file reads, hashing and decoding all release the GIL, so a thread pool overlaps them
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        surfaces = list(pool.map(load, paths))
+    save_index()
+    return surfaces
@@ -0,0 +1,90 @@
+import time
+
+import pygame
+
+# How a frame drawn at the game's low resolution gets onto the window. Nothing is allocated per frame:
+#   scale    stretch it over the window, scaled straight into the window surface
+#   integer  the largest whole-number zoom that fits the window, centered with black borders
+#   scale2x  the scale2x pixel art filter into a kept surface, stretched further if the window is bigger than 2x
+#   sdl      the window is opened at the frame size with pygame.SCALED and SDL scales it while presenting,
+#            the frame is drawn straight into the window surface so there is no copy at all
+SCALE_MODES = ('scale', 'integer', 'scale2x', 'sdl')
+
+class Presenter:
+    def __init__(self, size, window_size = (640, 480), mode = 'scale', vsync = False):
+        if mode not in SCALE_MODES:
+            raise ValueError(f'unknown scale mode {mode}, expected one of {", ".join(SCALE_MODES)}')
+        self.size = size
+        self.mode = mode
+        self.frames = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = 0.0  # seconds the last present took
+
+        self.window = None
+        if vsync:
+            # SDL only syncs a renderer it owns, which means a SCALED window
+            try:
+                self.window = pygame.display.set_mode(size if mode == 'sdl' else window_size, pygame.SCALED, vsync=1)
+            except pygame.error:
+                print('vsync not available, rendering without it')
+        if self.window is None:
+            self.window = pygame.display.set_mode(size, pygame.SCALED) if mode == 'sdl' else pygame.display.set_mode(window_size)
+
+        # surface: what the game draws a frame into, target: where in the window the scaled frame goes
+        self.surface = self.window if mode == 'sdl' else pygame.Surface(size)
+        self.target = self.window
+        self.double = None
+        if mode == 'integer':
+            zoom = max(1, min(self.window.get_width() // size[0], self.window.get_height() // size[1]))
+            rect = pygame.Rect(0, 0, size[0] * zoom, size[1] * zoom)
+            rect.center = self.window.get_rect().center
+            self.window.fill((0, 0, 0))
+            self.target = self.window.subsurface(rect.clip(self.window.get_rect()))
+        elif mode == 'scale2x' and self.window.get_size() != (size[0] * 2, size[1] * 2):
+            self.double = pygame.Surface((size[0] * 2, size[1] * 2))
+
+        # whole-number zoom from frame to target, if there is one. Only then can present scale just the changed rects,
+        # scale2x looks at neighbouring pixels so it always does the whole frame.
+        self.zoom = None
+        if mode == 'scale' or mode == 'integer':
+            width, height = self.target.get_size()
+            if width % size[0] == 0 and width // size[0] == height // size[1] and height % size[1] == 0:
+                self.zoom = width // size[0]
+
+    def present(self, rects = None):
+        # rects: the only parts of the frame that changed, in frame coordinates. None presents the whole frame.
+        start = time.perf_counter()
+        if rects is not None and self.mode == 'sdl':
+            pygame.display.update(rects)
+        elif rects is not None and self.zoom:
+            # a whole-number zoom maps every frame pixel to its own block of window pixels, so each rect can be scaled alone
+            zoom = self.zoom
+            left, top = self.target.get_abs_offset()
+            window_rects = []
+            for rect in rects:
+                if not rect:
+                    continue
+                window_rect = pygame.Rect(rect.x * zoom, rect.y * zoom, rect.width * zoom, rect.height * zoom)
+                pygame.transform.scale(self.surface.subsurface(rect), window_rect.size, self.target.subsurface(window_rect))
+                window_rects.append(window_rect.move(left, top))
+            pygame.display.update(window_rects)
+        else:
+            if self.mode == 'scale' or self.mode == 'integer':
+                pygame.transform.scale(self.surface, self.target.get_size(), self.target)
+            elif self.mode == 'scale2x':
+                if self.double:
+                    pygame.transform.scale2x(self.surface, self.double)
+                    pygame.transform.scale(self.double, self.target.get_size(), self.target)
+                else:
+                    pygame.transform.scale2x(self.surface, self.target)
+            pygame.display.update()
+
+        self.last = time.perf_counter() - start
+        self.frames += 1
+        self.total += self.last
+        self.worst = max(self.worst, self.last)
+
+    def report(self):
+        mean = self.total / self.frames if self.frames else 0.0
+        return f'present ({self.mode}, {self.window.get_width()}x{self.window.get_height()}): {self.frames} frames, {mean * 1000:.2f} ms mean, {self.worst * 1000:.2f} ms worst'
@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+
+PLAYER_BASIC = 0
+PLAYER_STRONG = 1
+DARKMAGE = 2
+FLAMEMITE = 3
+PROJECTILE_KINDS = {'player_basic' : PLAYER_BASIC, 'player_strong' : PLAYER_STRONG, 'darkmage' : DARKMAGE, 'flamemite' : FLAMEMITE}
+KIND_IMAGES = ['Projectile', 'Charged_Projectile', 'EProjectile', 'FlameProjectile']
+ENEMY_KIND = np.array([False, False, True, True])
+
+LIFETIME = 360
+HIT_SIZE = 8
+
+class Projectiles:
+    # fixed size pool, live projectiles are always packed into slots [0, count), removals compact the survivors
+    def __init__(self, game, capacity=4096):
+        self.game = game
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.direction = np.zeros(capacity)
+        self.timer = np.zeros(capacity, dtype=np.int32)
+        self.damage = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+
+        # [kind][facing left] -> image
+        self.sprites = []
+        for name in KIND_IMAGES:
+            img = game.assets[name]
+            self.sprites.append((img, game.sprites.flipped(img)))
+        self.half_sizes = [(img.get_width() / 2, img.get_height() / 2) for img, _ in self.sprites]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, pos, direction, damage, kind):
+        if self.count >= self.capacity:
+            return False
+        i = self.count
+        self.pos[i] = pos
+        self.direction[i] = direction
+        self.timer[i] = 0
+        self.damage[i] = damage
+        self.kind[i] = PROJECTILE_KINDS[kind]
+        self.count += 1
+        return True
+
+    def snapshot(self):
+        n = self.count
+        return n, self.pos[:n].copy(), self.direction[:n].copy(), self.timer[:n].copy(), self.damage[:n].copy(), self.kind[:n].copy()
+
+    def restore(self, snap):
+        n = self.count = snap[0]
+        self.pos[:n] = snap[1]
+        self.direction[:n] = snap[2]
+        self.timer[:n] = snap[3]
+        self.damage[:n] = snap[4]
+        self.kind[:n] = snap[5]
+
+    def remove_many(self, dead):
+        # dead is a bool mask over the live slots, keeps the survivors packed in their current order
+        keep = np.flatnonzero(~dead)
+        n = len(keep)
+        if n != self.count:
+            self.pos[:n] = self.pos[keep]
+            self.direction[:n] = self.direction[keep]
+            self.timer[:n] = self.timer[keep]
+            self.damage[:n] = self.damage[keep]
+            self.kind[:n] = self.kind[keep]
+            self.count = n
+
+    def update(self, tilemap):
+        n = self.count
+        if not n:
+            return
+        pos = self.pos[:n]
+        pos[:, 0] += self.direction[:n]
+        self.timer[:n] += 1
+
+        walls = tilemap.solid_at(pos[:, 0], pos[:, 1])
+        for i in np.flatnonzero(walls).tolist():
+            for _ in range(4):
+                self.game.sparks.spawn(pos[i].tolist(), self.game.rng.random() - 0.5 + (math.pi if self.direction[i] > 0 else 0), 2 + self.game.rng.random())
+        self.remove_many(walls | (self.timer[:n] > LIFETIME))
+
+        self.hit_entities()
+
+    def hit_entities(self):
+        n = self.count
+        if not n:
+            return
+        game = self.game
+        rect_x = np.trunc(self.pos[:n, 0] - HIT_SIZE / 2)
+        rect_y = np.trunc(self.pos[:n, 1] - HIT_SIZE / 2)
+        enemy_shot = ENEMY_KIND[self.kind[:n]]
+        dead = np.zeros(n, dtype=bool)
+
+        if game.player.dashing == 0:
+            hits = enemy_shot & self.overlap(rect_x, rect_y, game.player.rect())
+            for i in np.flatnonzero(hits).tolist():
+                dead[i] = True
+                game.player.take_damage(int(self.damage[i]), 'projectile')
+                for _ in range(10):
+                    angle = game.rng.random() * math.pi * 2
+                    game.sparks.spawn(game.player.rect().center, angle, 2 + game.rng.random())
+
+        # player shots against the enemy grid, each hits the first enemy it overlaps that is still alive
+        shots = np.flatnonzero(~enemy_shot)
+        rects = np.stack((rect_x[shots], rect_y[shots], np.full(len(shots), HIT_SIZE), np.full(len(shots), HIT_SIZE)), axis=1)
+        pairs, items = game.enemy_grid.query_pairs(rects)
+        enemies = game.enemy_grid.items
+        last = -1
+        for pair, item in zip(pairs.tolist(), items.tolist()):
+            enemy = enemies[item]
+            if pair == last or enemy.health <= 0:
+                continue
+            last = pair
+            dead[shots[pair]] = True
+            game.hit_enemy(enemy, int(self.damage[shots[pair]]))
+
+        if dead.any():
+            self.remove_many(dead)
+
+    def overlap(self, rect_x, rect_y, rect):
+        return (rect_x < rect.right) & (rect_x + HIT_SIZE > rect.left) & (rect_y < rect.bottom) & (rect_y + HIT_SIZE > rect.top)
+
+    def render(self, surf, offset=(0, 0), alpha=1.0, rects=False):
+        # alpha < 1 draws each shot part of the way back towards where it was a step ago, rects=True returns the blitted areas
+        n = self.count
+        if not n:
+            return []
+        kinds = self.kind[:n].tolist()
+        left = (self.direction[:n] < 0).tolist()
+        xs = (self.pos[:n, 0] - self.direction[:n] * (1 - alpha) - offset[0]).tolist()
+        ys = (self.pos[:n, 1] - offset[1]).tolist()
+        sprites = self.sprites
+        half_sizes = self.half_sizes
+        blits = []
+        for i in range(n):
+            kind = kinds[i]
+            half = half_sizes[kind]
+            blits.append((sprites[kind][left[i]], (xs[i] - half[0], ys[i] - half[1])))
+        return surf.blits(blits, doreturn=rects)
@@ -0,0 +1,88 @@
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+# A replay is the level and seed a session started from plus the action bitmask of every simulation step,
+# which is all the game needs to run the session again step for step. Every CHECK_EVERY steps it also
+# keeps a checksum of the game state, so a playback that drifts is caught close to where it went wrong.
+#   header: magic, version, flags, level, seed, checksum interval, step count
+#   body (zlib): one action byte per step, then one little-endian uint32 checksum per interval
+#   python -m Scripts.replay run.mmr [--render]
+
+MAGIC = b'MMRP'
+VERSION = 2  # 2: checksums hash the exact float bits
+HEADER = struct.Struct('<4sBBHQII')
+REPLAY_EXT = '.mmr'
+CHECK_EVERY = 60
+FLAG_BATCH_ENEMIES = 1
+
+class Recorder:
+    def __init__(self, path, level, seed, batch_enemies = False, check_every = CHECK_EVERY):
+        self.path = path
+        self.level = level
+        self.seed = seed
+        self.batch_enemies = batch_enemies
+        self.check_every = check_every
+        self.actions = bytearray()
+        self.checksums = []
+
+    def record(self, game, actions):
+        # called by Game.step once the step has run
+        self.actions.append(actions)
+        if len(self.actions) % self.check_every == 0:
+            self.checksums.append(game.checksum())
+
+    def save(self):
+        flags = FLAG_BATCH_ENEMIES if self.batch_enemies else 0
+        body = bytes(self.actions) + struct.pack(f'<{len(self.checksums)}I', *self.checksums)
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, flags, self.level, self.seed, self.check_every, len(self.actions)))
+            f.write(zlib.compress(body, 9))
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, flags, level, seed, check_every, steps = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} replay')
+    body = zlib.decompress(data[HEADER.size:])
+    replay = Recorder(path, level, seed, bool(flags & FLAG_BATCH_ENEMIES), check_every)
+    replay.actions = bytearray(body[:steps])
+    replay.checksums = list(struct.unpack(f'<{(len(body) - steps) // 4}I', body[steps:]))
+    return replay
+
+def play(replay, game, render = False, verify = True):
+    # returns the first step whose checksum doesn't match the recording, None if the whole run matched
+    game.reset(replay.level, replay.seed)
+    for i, actions in enumerate(replay.actions):
+        game.step(actions)
+        if render:
+            game.handle_events()
+            game.render()
+        if verify and (i + 1) % replay.check_every == 0 and game.checksum() != replay.checksums[i // replay.check_every]:
+            return i + 1
+    return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='play a recorded run back and check it still simulates the same')
+    parser.add_argument('replay')
+    parser.add_argument('--render', action='store_true', help='draw every step in a window, still as fast as possible')
+    parser.add_argument('--no-verify', action='store_true', help='skip the checksum comparison')
+    parser.add_argument('--repeat', type=int, default=1, help='play it this many times, for use as a benchmark')
+    args = parser.parse_args()
+
+    from main import Game
+
+    replay = load(args.replay)
+    game = Game(headless=not args.render, batch_enemies=replay.batch_enemies)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        mismatch = play(replay, game, args.render, not args.no_verify)
+        if mismatch is not None:
+            print(f'desync: state checksum differs at step {mismatch}')
+            sys.exit(1)
+    elapsed = time.perf_counter() - start
+    steps = len(replay.actions) * args.repeat
+    print(f'{steps} steps in {elapsed:.2f}s ({steps / elapsed:.0f} steps/s), level {replay.level}, seed {replay.seed}' + ('' if args.no_verify else ', checksums match'))
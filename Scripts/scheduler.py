@@ -0,0 +1,34 @@
+import heapq
+
+class Scheduler:
+    # events that fire a given number of steps from now. They wait in a heap, so a step where nothing
+    # is due costs one comparison no matter how many timers are pending.
+    def __init__(self):
+        self.now = 0
+        self.events = []  # (due step, sequence, event), the sequence keeps events due together in scheduling order
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def clear(self):
+        self.events = []
+
+    def schedule(self, delay, event):
+        heapq.heappush(self.events, (self.now + delay, self.sequence, event))
+        self.sequence += 1
+
+    def advance(self):
+        # one step on, returns the events due at the new step
+        self.now += 1
+        due = []
+        while self.events and self.events[0][0] <= self.now:
+            due.append(heapq.heappop(self.events)[2])
+        return due
+
+    def snapshot(self):
+        return self.now, self.sequence, list(self.events)
+
+    def restore(self, snap):
+        self.now, self.sequence, events = snap
+        self.events = list(events)
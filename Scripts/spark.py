@@ -1,27 +1,85 @@
 import math
 
+import numpy as np
 import pygame
 
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-        
-    def update (self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-        
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    
+class Sparks:
+    # every spark lives in a row of these arrays, the direction of a spark never changes so cos/sin are looked up once at spawn
+    def __init__(self, capacity = 256):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.direction = np.zeros((capacity, 2))  # cos(angle), sin(angle)
+        self.speed = np.zeros(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def grow(self):
+        capacity = len(self.speed) * 2
+        for name in ('pos', 'direction', 'speed'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def snapshot(self):
+        n = self.count
+        return n, self.pos[:n].copy(), self.direction[:n].copy(), self.speed[:n].copy()
+
+    def restore(self, snap):
+        # the arrays only ever grow, whatever was saved fits
+        n = self.count = snap[0]
+        self.pos[:n] = snap[1]
+        self.direction[:n] = snap[2]
+        self.speed[:n] = snap[3]
+
+    def spawn(self, pos, angle, speed):
+        if self.count == len(self.speed):
+            self.grow()
+        i = self.count
+        self.pos[i] = pos
+        self.direction[i] = (math.cos(angle), math.sin(angle))
+        self.speed[i] = speed
+        self.count += 1
+
+    def update(self):
+        # sparks that ran out of speed last frame were still drawn once, drop them now
+        n = self.count
+        alive = self.speed[:n] > 0
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            n = self.count = len(keep)
+            self.pos[:n] = self.pos[keep]
+            self.direction[:n] = self.direction[keep]
+            self.speed[:n] = self.speed[keep]
+
+        speed = self.speed[:n]
+        self.pos[:n] += self.direction[:n] * speed[:, None]
+        np.maximum(speed - 0.1, 0, out=speed)
+
     def render(self, surf, offset=(0,0)):
-        render_points=[
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),   
-        ]
-        
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
-            
\ No newline at end of file
+        n = self.count
+        if not n:
+            return []
+        x = self.pos[:n, 0] - offset[0]
+        y = self.pos[:n, 1] - offset[1]
+        speed = self.speed[:n]
+        c = self.direction[:n, 0]
+        s = self.direction[:n, 1]
+
+        # a diamond with long tips along the angle and short sides across it
+        # (the last point keeps the old sin(angle + pi/2) for y, which is cos(angle))
+        points = np.empty((n, 4, 2))
+        points[:, 0, 0] = x + c * speed * 3
+        points[:, 0, 1] = y + s * speed * 3
+        points[:, 1, 0] = x - s * speed * 0.5
+        points[:, 1, 1] = y + c * speed * 0.5
+        points[:, 2, 0] = x - c * speed * 3
+        points[:, 2, 1] = y - s * speed * 3
+        points[:, 3, 0] = x + s * speed * 0.5
+        points[:, 3, 1] = y + c * speed * 0.5
+
+        return [pygame.draw.polygon(surf, (255, 255, 255), polygon) for polygon in points.tolist()]
@@ -0,0 +1,55 @@
+import pygame
+
+ALPHA_STEP = 4  # pulse alpha is snapped to multiples of this, 64 faded copies per image at most
+
+class SpriteCache:
+    # mirrored / faded / tinted copies of asset surfaces, made on first use and then only looked up.
+    # Keys use id() of the source surface, the source is kept alive next to its variant so ids can't be reused.
+    def __init__(self):
+        self.variants = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.variants = {}
+
+    def get(self, img, key, make):
+        entry = self.variants.get((id(img), key))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        variant = make(img)
+        self.variants[(id(img), key)] = (img, variant)
+        return variant
+
+    def flipped(self, img):
+        return self.get(img, 'flip', lambda img: pygame.transform.flip(img, True, False))
+
+    def faded(self, img, alpha):
+        alpha = min(255, max(0, round(alpha / ALPHA_STEP) * ALPHA_STEP))
+        if alpha == 255:
+            return img
+
+        def make(img):
+            variant = img.copy()
+            variant.set_alpha(alpha)
+            return variant
+        return self.get(img, ('alpha', alpha), make)
+
+    def tinted(self, img, color):
+        def make(img):
+            variant = img.copy()
+            variant.fill(color, special_flags=pygame.BLEND_RGBA_MULT)
+            return variant
+        return self.get(img, ('tint', tuple(color)), make)
+
+    def memory(self):
+        return sum(variant.get_width() * variant.get_height() * variant.get_bytesize() for _, variant in self.variants.values())
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        return f'sprite cache: {len(self.variants)} variants, {self.memory() / 1024:.1f} KiB, {self.hit_rate():.1%} hit rate ({self.hits} hits, {self.misses} misses)'
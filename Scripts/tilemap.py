@@ -1,6 +1,11 @@
 import json
+import numpy as np
 import pygame
 
+from Scripts.grid import TileGrid, TILE_TYPES, tile_id, CHUNK_SHIFT, CHUNK_SIZE, CHUNK_MASK
+from Scripts.mapformat import read_map, write_map, MAP_EXT
+from Scripts.offgrid import OffgridIndex
+
 AUTOTILE_MAP = {
     tuple(sorted([(1,0), (0,1)])) : 0,  #topleft
     tuple(sorted([(1,0), (0,1), (-1,0)])) : 1,  #top
@@ -17,102 +22,276 @@ NEIGHBOUR_OFFSETS = [(-1,0),(-1,-1),(0,-1),(1,-1),(1,0),(0,0),(-1,1),(0,1),(1,1)
 PHYSICS_TILES = {'Grass', 'Stone', 'Halfblock','Temp', 'Wall'}
 AUTOTILE_TYPES = {'Grass', 'Stone', 'Wall', 'Lava'}
 
+PHYSICS_IDS = frozenset(tile_id(t) for t in PHYSICS_TILES)
+AUTOTILE_IDS = frozenset(tile_id(t) for t in AUTOTILE_TYPES)
+DROPDOWN_ID = tile_id('DropDown')
+DROPDOWN_IDS = frozenset((DROPDOWN_ID,))
+DROPDOWN_HEIGHT = 4  # dropdown platforms only collide along their top strip
+CHUNK_CACHE_SIZE = 64  # baked chunk surfaces kept, about 256 KB each; a view needs at most 6
+
+# same lookup as AUTOTILE_MAP, indexed by a bitmask of matching neighbours (bit n = AUTOTILE_SHIFTS[n]), -1 = keep variant
+AUTOTILE_SHIFTS = [(1,0), (-1,0), (0,-1), (0,1)]
+PHYSICS_LUT = np.zeros(256, dtype=bool)
+PHYSICS_LUT[list(PHYSICS_IDS)] = True
+
+AUTOTILE_LUT = [AUTOTILE_MAP.get(tuple(sorted(shift for bit, shift in enumerate(AUTOTILE_SHIFTS) if mask & (1 << bit))), -1) for mask in range(16)]
+
 class Tilemap:
     def __init__(self, game,  tile_size = 16):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}
-        self.offgrid_tiles = []
+        self.grid = TileGrid()
+        self.offgrid = OffgridIndex()
+
+        self.chunk_surfaces = {}  # chunk key -> baked Surface, least recently drawn first, dropped whenever the chunk changes
+        self.autotile_dirty = set()  # tiles placed or erased since the last autotile pass
+        self.dense = None  # (tile id array, origin x, origin y) for vectorized lookups, built on demand
+
+        # physics queries write into these lists and Rects, callers must not keep them across queries
+        self.physics_buffer = []
+        self.dropdown_buffer = []
+        self.physics_pool = [pygame.Rect(0, 0, 0, 0) for _ in NEIGHBOUR_OFFSETS]
+        self.dropdown_pool = [pygame.Rect(0, 0, 0, 0) for _ in NEIGHBOUR_OFFSETS]
+
+    def get_tile(self, loc):
+        tid = self.grid.get(loc[0], loc[1])
+        if tid:
+            return (TILE_TYPES[tid], self.grid.get_variant(loc[0], loc[1]))
+
+    def tile_type(self, loc):
+        return TILE_TYPES[self.grid.get(loc[0], loc[1])]
+
+    def set_tile(self, loc, tile_type, variant = 0):
+        tid = tile_id(tile_type)
+        if self.grid.get(loc[0], loc[1]) == tid and self.grid.get_variant(loc[0], loc[1]) == variant:
+            return
+        self.grid.set(loc[0], loc[1], tid, variant)
+        self.tile_changed(loc)
+        self.autotile_dirty.add(loc)
+
+    def remove_tile(self, loc):
+        if self.grid.remove(loc[0], loc[1]):
+            self.tile_changed(loc)
+            self.autotile_dirty.add(loc)
+            return True
+        return False
+
+    def tile_changed(self, loc):
+        self.chunk_surfaces.pop((loc[0] >> CHUNK_SHIFT, loc[1] >> CHUNK_SHIFT), None)
+        if self.dense is not None:
+            types, ox, oy = self.dense
+            if 0 <= loc[1] - oy < types.shape[0] and 0 <= loc[0] - ox < types.shape[1]:
+                types[loc[1] - oy, loc[0] - ox] = self.grid.get(loc[0], loc[1])
+            else:
+                self.dense = None
+
+    def dense_types(self):
+        if self.dense is None:
+            self.dense = self.grid.dense()
+        return self.dense
+
+    def types_at(self, xs, ys):
+        # tile ids under arrays of pixel positions, 0 where there is no tile
+        types, ox, oy = self.dense_types()
+        tx = np.floor_divide(xs, self.tile_size).astype(np.int64) - ox
+        ty = np.floor_divide(ys, self.tile_size).astype(np.int64) - oy
+        inside = (tx >= 0) & (tx < types.shape[1]) & (ty >= 0) & (ty < types.shape[0])
+        out = np.zeros(tx.shape, dtype=np.uint8)
+        out[inside] = types[ty[inside], tx[inside]]
+        return out
+
+    def solid_at(self, xs, ys):
+        return PHYSICS_LUT[self.types_at(xs, ys)]
+
+    def iter_tiles(self):
+        for x, y, tid, variant in self.grid:
+            yield (x, y), TILE_TYPES[tid], variant
+
+    def offgrid_size(self, tile):
+        if self.game is None:
+            return (self.tile_size, self.tile_size)
+        return self.game.assets[tile['type']][tile['variant']].get_size()
+
+    def add_offgrid(self, tile):
+        return self.offgrid.add(tile, self.offgrid_size(tile))
+
+    def remove_offgrid(self, tile):
+        return self.offgrid.remove(tile)
+
+    def offgrid_at(self, pos):
+        return self.offgrid.query_point(pos)
+
+    def load_offgrid(self, tiles):
+        self.offgrid.clear()
+        for tile in tiles:
+            self.add_offgrid(tile)
 
     def extract(self, id_pairs, keep = False):
         matches = []
-        for tile in self.offgrid_tiles.copy():
+        for tile in self.offgrid:
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
+                    self.remove_offgrid(tile)
 
-        for loc in list(self.tilemap.keys()):
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]['pos'] = matches[-1]['pos'].copy()
-                matches[-1]['pos'][0] *= self.tile_size
-                matches[-1]['pos'][1] *= self.tile_size
+        for loc, tile_type, variant in list(self.iter_tiles()):
+            if (tile_type, variant) in id_pairs:
+                matches.append({'type' : tile_type, 'variant' : variant, 'pos' : [loc[0] * self.tile_size, loc[1] * self.tile_size]})
                 if not keep:
-                    del self.tilemap[loc]
+                    self.remove_tile(loc)
 
         return matches
 
-    def tiles_around(self,pos):
-        tiles=[]
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-        for offset in NEIGHBOUR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
-        return tiles
-    
     def save(self, path):
+        if path.endswith(MAP_EXT):
+            write_map(path, self.grid, self.tile_size, list(self.offgrid))
+            return
+
+        tilemap = {}
+        for loc, tile_type, variant in self.iter_tiles():
+            tilemap[str(loc[0]) + ';' + str(loc[1])] = {'type' : tile_type, 'variant' : variant, 'pos' : list(loc)}
+
         f= open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles},f)
+        json.dump({'tilemap': tilemap, 'tile_size': self.tile_size, 'offgrid': list(self.offgrid)},f)
         f.close()
 
     def load(self, path):
+        if path.endswith(MAP_EXT):
+            self.tile_size, chunks, next_order, offgrid_tiles = read_map(path)
+            self.load_offgrid(offgrid_tiles)
+            self.grid.load_chunks(chunks, next_order)
+            self.chunk_surfaces = {}
+            self.autotile_dirty = set()
+            self.dense = None
+            return
+
         f = open(path, 'r')
         map_data = json.load(f)
         f.close()
 
-        self.tilemap = map_data['tilemap']
+        self.grid.clear()
+        self.chunk_surfaces = {}
+        for tile in map_data['tilemap'].values():
+            self.grid.set(tile['pos'][0], tile['pos'][1], tile_id(tile['type']), tile['variant'])
         self.tile_size = map_data['tile_size']
-        self.offgrid_tiles = map_data['offgrid']
+        self.load_offgrid(map_data['offgrid'])
+        self.autotile_dirty = set()
+        self.dense = None
 
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ";" + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        return self.grid.get(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)) in PHYSICS_IDS
 
+    def rects_around(self, pos, ids, height, out, pool):
+        # one rect per matching tile around pos, in NEIGHBOUR_OFFSETS order like the per-tile lookup always gave
+        out.clear()
+        grid = self.grid
+        ts = self.tile_size
+        tile_x = int(pos[0] // ts)
+        tile_y = int(pos[1] // ts)
+        for offset in NEIGHBOUR_OFFSETS:
+            x = tile_x + offset[0]
+            y = tile_y + offset[1]
+            if grid.get(x, y) in ids:
+                rect = pool[len(out)]
+                rect.update(x * ts, y * ts, ts, height)
+                out.append(rect)
+        return out
+
+    # both return reused rects in a reused list: read them, don't modify or keep them
     def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
-        return rects
+        return self.rects_around(pos, PHYSICS_IDS, self.tile_size, self.physics_buffer, self.physics_pool)
     
     def dropdown_rects_around(self,pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] == 'DropDown':
-                rect = pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, 4)
-                rects.append(rect)
-        return rects
+        return self.rects_around(pos, DROPDOWN_IDS, DROPDOWN_HEIGHT, self.dropdown_buffer, self.dropdown_pool)
     
-    def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1,0),(-1,0), (0,-1), (0,1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
+    def autotile_variant(self, x, y):
+        tid = self.grid.get(x, y)
+        if tid not in AUTOTILE_IDS:
+            return -1
+        mask = 0
+        for bit, shift in enumerate(AUTOTILE_SHIFTS):
+            if self.grid.get(x + shift[0], y + shift[1]) == tid:
+                mask |= 1 << bit
+        return AUTOTILE_LUT[mask]
+
+    def autotile(self, dirty_only = False):
+        if not dirty_only:
+            self.autotile_all()
+            return
+
+        # a placed or erased tile can only change its own variant and its four neighbours'
+        locs = set()
+        for x, y in self.autotile_dirty:
+            locs.add((x, y))
+            for shift in AUTOTILE_SHIFTS:
+                locs.add((x + shift[0], y + shift[1]))
+        self.autotile_dirty = set()
+
+        for x, y in locs:
+            variant = self.autotile_variant(x, y)
+            if variant >= 0 and variant != self.grid.get_variant(x, y):
+                self.grid.set_variant(x, y, variant)
+                self.chunk_surfaces.pop((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT), None)
+
+    def autotile_all(self):
+        self.autotile_dirty = set()
+        chunks = self.grid.chunks
+        if not chunks:
+            return
+
+        # pad the whole-map array by one cell so neighbours across chunk borders and map edges line up
+        types, ox, oy = self.grid.dense()
+        types = np.pad(types, 1)
+
+        center = types[1:-1, 1:-1]
+        mask = ((types[1:-1, 2:] == center).astype(np.uint8)
+                | ((types[1:-1, :-2] == center) << 1)
+                | ((types[:-2, 1:-1] == center) << 2)
+                | ((types[2:, 1:-1] == center) << 3))
+        variants = np.array(AUTOTILE_LUT, dtype=np.int16)[mask]
+        variants[~np.isin(center, list(AUTOTILE_IDS))] = -1
+
+        for (cx, cy), chunk in chunks.items():
+            x = (cx << CHUNK_SHIFT) - ox
+            y = (cy << CHUNK_SHIFT) - oy
+            new = variants[y:y + CHUNK_SIZE, x:x + CHUNK_SIZE].ravel()
+            old = np.frombuffer(chunk.variants, dtype=np.uint8)
+            update = new >= 0
+            if np.any(old[update] != new[update]):
+                merged = np.where(update, new, old).astype(np.uint8)
+                chunk.writable().variants[:] = merged.tobytes()
+                self.chunk_surfaces.pop((cx, cy), None)
 
+    def bake_chunk(self, key):
+        chunk = self.grid.chunks.get(key)
+        if chunk is None:
+            return None
 
+        surf = pygame.Surface((CHUNK_SIZE * self.tile_size, CHUNK_SIZE * self.tile_size), pygame.SRCALPHA)
+        assets = self.game.assets
+        types = chunk.types
+        variants = chunk.variants
+        for i in range(len(types)):
+            if types[i]:
+                surf.blit(assets[TILE_TYPES[types[i]]][variants[i]], ((i & CHUNK_MASK) * self.tile_size, (i >> CHUNK_SHIFT) * self.tile_size))
+        return surf
 
     def render(self, surf, offset = (0, 0)):
-        for tile in self.offgrid_tiles:  
+        for tile in self.offgrid.query_rect(offset[0], offset[1], surf.get_width(), surf.get_height()):
             surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
 
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']],  (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(offset[0] // chunk_px, (offset[0] + surf.get_width()) // chunk_px + 1):
+            for cy in range(offset[1] // chunk_px, (offset[1] + surf.get_height()) // chunk_px + 1):
+                key = (cx, cy)
+                if key not in self.grid.chunks:
+                    continue
+                chunk_surf = self.chunk_surfaces.pop(key, None)
+                if chunk_surf is None:
+                    chunk_surf = self.bake_chunk(key)
+                self.chunk_surfaces[key] = chunk_surf
+                surf.blit(chunk_surf, (cx * chunk_px - offset[0], cy * chunk_px - offset[1]))
 
-                
-        
\ No newline at end of file
+        # scrolling across a big map would otherwise keep every chunk it ever showed
+        while len(self.chunk_surfaces) > CHUNK_CACHE_SIZE:
+            del self.chunk_surfaces[next(iter(self.chunk_surfaces))]
@@ -1,39 +1,90 @@
+import math
 import os
+import time
 
-import pygame
+from Scripts import pixel_cache
+from Scripts.atlas import Atlas, ATLAS_DIR, find_images
 
 BASE_IMG_PATH = 'Assets/'
 
+atlas = None  # built with python -m Scripts.atlas, images missing from it are loaded from their own files
+decoded = {}  # path -> converted surface, filled by preload_images
+timings = {}  # asset group (first folder of the path) -> seconds spent loading it, for --startup-profile
+
+def get_atlas():
+    global atlas
+    if atlas is None:
+        atlas = Atlas(BASE_IMG_PATH)
+    return atlas
+
+def reset():
+    global atlas
+    atlas = None
+    decoded.clear()
+    timings.clear()
+    pixel_cache.reset()
+
+def add_timing(group, start):
+    timings[group] = timings.get(group, 0) + time.perf_counter() - start
+
+def preload_images(paths = None):
+    # decode images about to be loaded on a thread pool up front: the atlas sheets not loaded yet,
+    # or without an atlas the given paths (all images by default)
+    start = time.perf_counter()
+    sheets = get_atlas().sheet_names
+    if sheets:
+        paths = [ATLAS_DIR + '/' + name for i, name in enumerate(sheets) if i not in atlas.sheets]
+    elif paths is None:
+        paths = find_images(BASE_IMG_PATH)[0]
+    paths = [path for path in paths if path not in decoded]
+    for path, surf in zip(paths, pixel_cache.load_many([BASE_IMG_PATH + path for path in paths])):
+        decoded[path] = surf.convert_alpha()
+    for i, name in enumerate(sheets):
+        if ATLAS_DIR + '/' + name in decoded:
+            atlas.sheets[i] = decoded.pop(ATLAS_DIR + '/' + name)
+    add_timing('decode', start)
+
+def image_paths(path):
+    names = get_atlas().listdir(path)
+    if names is None:
+        names = sorted(os.listdir(BASE_IMG_PATH + path))
+    return [path + '/' + img_name for img_name in names] #when naming images use 01 format instead of going 1
+
 def load_image(path):
-    img = pygame.image.load(BASE_IMG_PATH + path).convert_alpha()
-    #img.set_colorkey((0,0,0)) #might will have to change this!!!
+    start = time.perf_counter()
+    img = decoded.pop(path, None)
+    if img is None:
+        img = get_atlas().image(path)
+    if img is None:
+        img = pixel_cache.load(BASE_IMG_PATH + path).convert_alpha()
+        #img.set_colorkey((0,0,0)) #might will have to change this!!!
+    add_timing(path.split('/')[0] if '/' in path else 'backgrounds', start)
     return img
 
 def load_images(path):
-    images = []
-    for img_name in sorted(os.listdir(BASE_IMG_PATH + path)): #when naming images use 01 format instead of going 1
-        images.append(load_image(path + '/' + img_name))
-    return images
+    return [load_image(img_path) for img_path in image_paths(path)]
 
 class Animation:
-    def __init__(self, images, img_dur = 5, loop = True):
+    # A frame sequence shared by everything that plays it, never modified after loading.
+    # Whoever plays it keeps the tick it started at and asks for the image at the current tick of the game's clock.
+    # sync animations ignore the start, so every instance shows the same frame.
+    def __init__(self, images, img_dur = 5, loop = True, sync = False):
         self.images = images
         self.loop = loop
         self.img_duration = img_dur
-        self.done = False
-        self.frame = 0
-    
-    def copy(self):
-        return Animation(self.images , self.img_duration, self.loop)
-    
-    def update(self):
+        self.sync = sync
+        self.length = img_dur * len(images)
+
+    def frame(self, now, start = 0, speed = 1):
+        elapsed = (now if self.sync else now - start) * speed
         if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
-        else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
-                self.done = True
-    
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
+            return elapsed % self.length
+        return min(elapsed, self.length - 1)
+
+    def duration(self, speed = 1):
+        # ticks a one-shot animation takes to reach its last frame
+        return math.ceil((self.length - 1) / speed)
+
+    def img(self, now, start = 0, speed = 1):
+        return self.images[self.frame(now, start, speed) // self.img_duration]
         
\ No newline at end of file
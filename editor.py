@@ -1,8 +1,9 @@
 import sys
 import pygame
 
-from Scripts.utils import load_images
+from Scripts.assets import AssetRegistry
 from Scripts.tilemap import Tilemap
+from Scripts.present import Presenter
 
 RENDER_SCALE = 2.0
 
@@ -12,28 +13,14 @@ class Editor:
         pygame.init()
 
         pygame.display.set_caption("Editor")
-        self.screen = pygame.display.set_mode((640, 480))
-
-        self.display = pygame.Surface((320,240))
+        self.presenter = Presenter((320, 240), (640, 480))
+        self.display = self.presenter.surface
 
         self.clock = pygame.time.Clock()
     
 
-        self.assets = {
-            'Grass' : load_images('Tiles/Grass'),
-            'Stone' : load_images('Tiles/Stone'),
-            'Halfblock' : load_images('Tiles/Halfblock'),
-            'Mana' : load_images('Tiles/Mana'),
-            'Spawner' : load_images('Tiles/Spawner'),
-            'Lava' : load_images('Tiles/Lava'),
-            'Hazards' :load_images("Tiles/Hazards"),
-            'DropDown' : load_images("Tiles/DropDown"),
-            'Temp' :load_images('Tiles/Temp'),
-            'Wall' :load_images('Tiles/Wall'),
-            'Goal' : load_images('Tiles/Goal'),
-            'Decor' : load_images('Tiles/Decor'),
-            
-        }
+        self.assets = AssetRegistry()
+        self.assets.load_group('tiles')
 
         self.movement = [False, False, False, False]
 
@@ -46,7 +33,7 @@ class Editor:
 
         self.scroll = [0, 0]
 
-        self.tile_list = list(self.assets)
+        self.tile_list = self.assets.names('tiles')
         self.tile_group = 0
         self.tile_variant = 0
         self.clicking = False
@@ -77,16 +64,11 @@ class Editor:
                 self.display.blit(current_tile_img, mpos)
 
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type' : self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos}
+                self.tilemap.set_tile(tile_pos, self.tile_list[self.tile_group], self.tile_variant)
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                self.tilemap.remove_tile(tile_pos)
+                for tile in self.tilemap.offgrid_at((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.tilemap.remove_offgrid(tile)
 
             self.display.blit(current_tile_img, (5, 5))
 
@@ -99,7 +81,7 @@ class Editor:
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.tilemap.add_offgrid({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
 
                     if event.button == 3:
                         self.right_clicking = True
@@ -134,8 +116,8 @@ class Editor:
                         self.movement[3] = True
                     if event.key == pygame.K_g:
                         self.ongrid = not self.ongrid
-                    if event.key == pygame.K_t:  # Click T to make autotile work     
-                        self.tilemap.autotile()
+                    if event.key == pygame.K_t:  # Click T to make autotile work, only around tiles edited since the last press. Shift+T redoes the whole map
+                        self.tilemap.autotile(dirty_only = not self.shift)
                     if event.key == pygame.K_o:
                         self.tilemap.save('map.json') #verify the name later
                     if event.key == pygame.K_LSHIFT:
@@ -153,8 +135,7 @@ class Editor:
                     if event.key == pygame.K_LSHIFT:
                         self.shift = False
 
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
+            self.presenter.present()
             self.clock.tick(60) # for keeping the game run at 60 fps
 Editor().run()
 
@@ -1,78 +1,106 @@
+import argparse
+import os
+import shutil
+import struct
 import sys
+import tempfile
+import time
+import zlib
 import pygame
 import math
 import random
 
-from Scripts.utils import load_image, load_images, Animation
+from Scripts import utils, pixel_cache
 
 from Scripts.entities import PhysicsEntity, Player, DarkMage, Slime, Flamemite
+from Scripts.enemy_batch import EnemyBatch
 
 from Scripts.tilemap import Tilemap
+from Scripts.mapformat import MAP_EXT, is_current
 from Scripts.clouds import Clouds
-from Scripts.particle import Particle
+from Scripts.particle import Particles
+from Scripts.projectiles import Projectiles
+from Scripts.broadphase import Broadphase
+from Scripts.sprite_cache import SpriteCache
+from Scripts.assets import AssetRegistry
 
-from Scripts.spark import Spark
+from Scripts.spark import Sparks
 from Scripts.hud import HUD
+from Scripts.replay import Recorder
+from Scripts.scheduler import Scheduler
+from Scripts.present import Presenter, SCALE_MODES
+
+# action bits for Game.step: held ones stay set while the key is down, the others only on the step it was pressed
+LEFT = 1
+RIGHT = 2
+DOWN = 4
+JUMP = 8
+BASIC_ATTACK = 16
+STRONG_ATTACK = 32
+DASH = 64
+
+HELD_KEYS = {pygame.K_LEFT : LEFT, pygame.K_RIGHT : RIGHT, pygame.K_DOWN : DOWN}
+PRESS_KEYS = {pygame.K_UP : JUMP, pygame.K_x : BASIC_ATTACK, pygame.K_z : STRONG_ATTACK, pygame.K_c : DASH}
+
+TEMP_SHAKE_STEPS = 35  # steps a temp block has to be stood on before it breaks
+TEMP_BREAK_SPEED = 2  # the breaking animation plays at double speed
+TEMP_RESPAWN_STEPS = 300
+MANA_RESPAWN_STEPS = 1200  # final level only
+
+SIM_RATE = 60  # simulation steps per second, fixed: every timer, speed and cooldown in the game counts steps
+MAX_FRAME_TIME = 0.25  # after a longer stall (window dragged, breakpoint) the simulation skips ahead instead of catching up
 
 class Game:
-    def __init__(self):
+    def __init__(self, batch_enemies = False, sprite_stats = False, fps = 60, vsync = False, headless = False, seed = None, scale_mode = 'scale', present_stats = False, dirty_rects = False):
+        self.headless = headless  # no window, HUD or drawing: the game only moves through step()
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'  # a display mode is still needed to convert images
         pygame.init()
 
-        pygame.display.set_caption("Platformer Project Fall") #1. name of window 2. you can change the icon of the app too (look into it)
-        self.screen = pygame.display.set_mode((640, 480))
+        self.batch_enemies = batch_enemies  # simulate all enemies together on NumPy arrays, see Scripts/enemy_batch.py
+        self.sprite_stats = sprite_stats  # print sprite cache size and hit rate on exit
+        self.fps = fps  # render cap, 0 renders as fast as possible
+        self.present_stats = present_stats  # print how long getting frames onto the window took on exit
+        self.dirty_rects = dirty_rects  # redraw and present only what changed while the camera holds still, see render_dirty
 
-        self.display = pygame.Surface((320,240))
+        pygame.display.set_caption("Platformer Project Fall") #1. name of window 2. you can change the icon of the app too (look into it)
+        self.presenter = Presenter((320, 240), (640, 480), scale_mode, vsync)
+        self.display = self.presenter.surface
+        self.static = None  # dirty rect mode: render_static of the last full redraw, kept up to date
+        self.static_scroll = None
+        self.static_level = None
+        self.static_dead = False
+        self.static_clouds = []
+        self.static_broken = set()
+        self.dirty_drawn = []  # where the sprites of the last frame went
 
         self.clock = pygame.time.Clock()
     
         self.movement = [False, False, False] 
+        self.held = 0
+        self.pressed = 0
+        self.steps = 0
+        self.won = False
+        self.ticks = 0  # animation clock, counts every simulation step and never goes back to 0
 
-        self.assets ={
-            'Grass' : load_images('Tiles/Grass'),   
-            'Stone' : load_images('Tiles/Stone'),
-            'Halfblock' : load_images('Tiles/Halfblock'),
-            'Mana' : load_images('Tiles/Mana'),
-            'Spawner' : load_images('Tiles/Spawner'),
-            'Lava' : load_images('Tiles/Lava'),
-            'Hazards' :load_images("Tiles/Hazards"),
-            'DropDown' : load_images("Tiles/DropDown"),
-            'Temp' :load_images('Tiles/Temp'),
-            'Wall' :load_images('Tiles/Wall'),
-            'Goal' : load_images('Tiles/Goal'),
-            'Decor' : load_images('Tiles/Decor'),
-            'Temp/Breaking' :Animation(load_images('Tiles/TempAnimations/Breaking'), img_dur=2, loop=False),
-            'Temp/Shaking' :Animation(load_images('Tiles/TempAnimations/Shaking'),img_dur=5),
-            'Temp/Broken' :load_image('Tiles/TempAnimations/Broken/000.png'),
-            'Wall' :load_images('Tiles/Wall'),
-            'EProjectile' : load_image('Enemies/DarkMage/EEnergy_Ball.png'),
-            'EStaff' : load_image('Enemies/DarkMage/EStaff.png'),
-            'FlameProjectile' : load_image('Enemies/Flame_mite/FlameProjectile.png'),
-            'background' : load_image('background.png'),
-            'castlebackground' : load_image('bgcastle.png'),
-            'cavebackground': load_image('bgcave.png'),
-            'clouds': load_images('clouds'),
-            'player/idle' : Animation(load_images('Character/Idle'), img_dur=6),
-            'player/run' : Animation(load_images('Character/Run'), img_dur=4),
-            'player/Staffattack' : Animation(load_images('Character/Attack'),img_dur=6),
-            'player/Failattack': Animation(load_images('Character/Failattack'), img_dur=4),
-            'player/dash' : Animation(load_images('Character/Dash')),
-            'player/jump' : Animation(load_images('Character/Jump')),
-            'player/Wallslide' : Animation(load_images('Character/Wallslide')),
-            'Flames' : Animation(load_images('particle/flames'), img_dur=20, loop=False),
-            'ManaAmbience' : Animation(load_images('particle/ManaAmbience'),img_dur=20, loop=False),
-            'Slime/idle' : Animation(load_images('Enemies/Slime/idle'), img_dur=6), #Nuke this folder if useless
-            'Slime/walk' : Animation(load_images('Enemies/Slime/Walk'), img_dur=4),
-            'Flamemite/idle' : Animation(load_images('Enemies/Flame_mite/idle'), img_dur=6), #Nuke this folder if useless
-            'Flamemite/attack' : Animation(load_images('Enemies/Flame_mite/Attack')),
-            'Flamemite/walk' : Animation(load_images('Enemies/Flame_mite/Walk'), img_dur=4),
-            'DarkMage/EStaffattack' : Animation(load_images('Enemies/DarkMage/Attack'),img_dur=6),
-            'DarkMage/walk' : Animation(load_images('Enemies/DarkMage/Walk'), img_dur=4),
-            'DarkMage/idle' : Animation(load_images('Enemies/DarkMage/idle'), img_dur=4),
-            'Projectile' : load_image('Character/Energy_Ball.png'),
-            'Charged_Projectile' : load_image('Character/MAXENERGYBALL.png'),
-        }
+        self.assets = AssetRegistry()  # everything is declared in Assets/manifest.json
+        self.assets.load_resident()
+
+        # every random number the simulation draws comes from here, so (seed, actions) replays a run exactly
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.recorder = None
 
         self.clouds = Clouds(self.assets['clouds'], count=16)
+        self.sprites = SpriteCache()
+        self.projectiles = Projectiles(self)
+        self.sparks = Sparks()
+        self.particles = Particles(self, ['ManaAmbience', 'Flames'])
+        self.enemy_grid = Broadphase()   # rebuilt every frame once enemies have moved
+        self.pickup_grid = Broadphase()  # rebuilt when a mana pickup is collected or respawns
+        self.goal_grid = Broadphase()
+        self.block_timers = Scheduler()  # temp blocks finishing their break and respawning, run at the start of a step
+        self.mana_timers = Scheduler()  # mana respawns, run after pickups are collected
 
         self.player = Player(self, (50,50), (8,16))  #Check if it needs further updating!!!
 
@@ -81,14 +109,25 @@ class Game:
         self.current_level = 0
         self.load_level(0)
 
-        self.hud = HUD(self)
+        self.hud = None if headless else HUD(self)
         
         
 
+    def level_path(self, map_id):
+        path = 'Maps/' + str(map_id)
+        # binary maps are built from the json ones, so ignore a binary map older than its json or in another format version
+        if os.path.exists(path + MAP_EXT) and is_current(path + MAP_EXT):
+            if not os.path.exists(path + '.json') or os.path.getmtime(path + MAP_EXT) >= os.path.getmtime(path + '.json'):
+                return path + MAP_EXT
+        return path + '.json'
+
     def load_level(self, map_id):
-        self.tilemap.load('Maps/' + str(map_id) + '.json')
+        self.tilemap.load(self.level_path(map_id))
+        self.assets.load_level(map_id)
+        self.sprites.clear()  # drop variants of anything the previous level unloaded
 
         self.current_level = map_id
+        self.static_level = None  # a reload of the same level redraws everything too
 
         self.mana_pickups = []
         self.mana_respawn_data = {}
@@ -98,22 +137,23 @@ class Game:
             self.mana_pickups.append(pygame.Rect(mana['pos'][0], mana['pos'][1], 16, 16))
 
             if self.current_level == 2:
-                mana_key = f"{int(mana['pos'][0])};{int(mana['pos'][1])}"
-                self.mana_respawn_data[mana_key] = {'rect' : mana_rect, 'collected' : False, 'respawn_timer' : 0}
+                mana_key = (int(mana['pos'][0]), int(mana['pos'][1]))
+                self.mana_respawn_data[mana_key] = {'rect' : mana_rect, 'collected' : False}
         #print(f"Level {self.current_level}: Created {len(self.mana_respawn_data)} mana respawn entries")
         #print(f"Mana respawn data: {self.mana_respawn_data}")
 
         self.goal = []
         for goal in self.tilemap.extract([('Goal', 0)]):
             self.goal.append(pygame.Rect(goal['pos'][0], goal['pos'][1], 16, 16))
+        self.goal_grid.build(self.goal)
+        self.pickup_grid.build(self.mana_pickups)
 
         self.temp_blocks = {}
-        self.temp_blocks_animation = {}
-        for loc, tile in list(self.tilemap.tilemap.items()):
-            if tile['type'] == 'Temp':
-                self.temp_blocks[loc] = {'state' : 'solid', 'timer' : 0, 'respawn_timer' : 0, 'original_variant' : tile['variant']}
-
-                self.temp_blocks_animation[loc] = {'shaking': self.assets['Temp/Shaking'].copy(), 'breaking' : self.assets['Temp/Breaking'].copy(), 'broken' : self.assets['Temp/Broken'].copy()}
+        self.block_timers.clear()
+        self.mana_timers.clear()
+        for loc, tile_type, variant in list(self.tilemap.iter_tiles()):
+            if tile_type == 'Temp':
+                self.temp_blocks[loc] = {'state' : 'solid', 'timer' : 0, 'since' : 0, 'original_variant' : variant}  # since: tick the current state began
 
         self.enemies = []
         self.boss = None
@@ -129,360 +169,545 @@ class Game:
                 self.enemies.append(boss)
                 self.boss = boss
 
+        self.enemy_batch = EnemyBatch(self, self.enemies) if self.batch_enemies else None
+        self.enemy_grid.build([enemy.rect() for enemy in self.enemies], list(self.enemies))
 
 
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
+        self.projectiles.clear()
+        self.particles.clear()
+        self.sparks.clear()
         
         
         self.scroll = [0, 0]
+        self.prev_scroll = [0, 0]
+        self.player.prev_pos = list(self.player.pos)
         self.current_level = map_id
         self.death_timer = 0
 
         self.player.hp = self.player.max_hp
         self.player.mana = 0
         self.player.dead = False
+        self.player.death_cause = None
         self.player.invincibility = 0
         self.player.attacking = 0
         self.player.dashing = 0
         self.player.dash_cd = 0
 
-    
-    def run(self):
-        
-        while True:
-            
-            if self.current_level == 0:
-                self.display.blit(self.assets['background'], (0,0))
-            elif self.current_level == 1:
-                self.display.blit(self.assets['cavebackground'], (0,0))
-            elif self.current_level == 2:
-                self.display.blit(self.assets['castlebackground'], (0,0))
-            
-
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30 
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            for loc in list(self.temp_blocks.keys()):  #Temp tiles management
-                block = self.temp_blocks[loc]
-                
-                tile_pos = [int(s) for s in loc.split(';')]
-                block_rect = pygame.Rect(tile_pos[0] * 16, tile_pos[1] * 16, 16, 16)
+    def reset(self, map_id = 0, seed = None):
+        # start a fresh run on a level with a new player, for headless sessions and replays
+        if seed is None and self.recorder:
+            # a replay can only rebuild a run that starts from a seed
+            seed = self.rng.randrange(2 ** 32)
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.player = Player(self, (50,50), (8,16))
+        self.load_level(map_id)
+        self.steps = 0
+        self.won = False
+        if self.recorder:
+            # the old inputs belong to a run that no longer exists, the recording starts over from here
+            self.recorder = Recorder(self.recorder.path, self.current_level, self.seed, self.batch_enemies)
+        return self.state()
+
+    def snapshot(self, particles = False):
+        # everything the simulation needs to carry on from this step. Plain values, array slices and references
+        # to the entity objects (whose attributes are saved next to them), nothing is deep copied.
+        # Sparks and particles don't affect the simulation, particles=True keeps them too.
+        temp_blocks = [(loc, block['state'], block['timer'], block['since']) for loc, block in self.temp_blocks.items()]
+
+        return {
+            'level' : self.current_level,
+            'steps' : self.steps,
+            'ticks' : self.ticks,
+            'won' : self.won,
+            'death_timer' : self.death_timer,
+            'scroll' : tuple(self.scroll),
+            'prev_scroll' : tuple(self.prev_scroll),
+            'rng' : self.rng.getstate(),
+            'player' : (self.player, self.player.snapshot()),
+            'enemies' : [(enemy, enemy.snapshot()) for enemy in self.enemies],
+            'boss' : self.boss,
+            'enemy_batch' : (self.enemy_batch, self.enemy_batch.snapshot()) if self.enemy_batch else None,
+            'projectiles' : self.projectiles.snapshot(),
+            'mana_pickups' : list(self.mana_pickups),
+            'mana_respawn' : [(key, data['collected']) for key, data in self.mana_respawn_data.items()],
+            'temp_blocks' : temp_blocks,
+            'block_timers' : self.block_timers.snapshot(),
+            'mana_timers' : self.mana_timers.snapshot(),
+            'particles' : (self.sparks.snapshot(), self.particles.snapshot()) if particles else None,
+        }
 
-                if loc in self.temp_blocks_animation:
-                    for key, anim in self.temp_blocks_animation[loc].items():
-                        if key != 'broken':
-                            anim.update()
+    def restore(self, snap):
+        # a snapshot can be restored any number of times. Only a snapshot from another level has to reload the map.
+        if snap['level'] != self.current_level:
+            self.load_level(snap['level'])
+        self.steps = snap['steps']
+        self.ticks = snap['ticks']
+        self.won = snap['won']
+        self.death_timer = snap['death_timer']
+        self.scroll[0], self.scroll[1] = snap['scroll']
+        self.prev_scroll[0], self.prev_scroll[1] = snap['prev_scroll']
+        self.rng.setstate(snap['rng'])
+
+        self.enemy_batch = None
+        if snap['enemy_batch']:
+            self.enemy_batch, state = snap['enemy_batch']
+            self.enemy_batch.restore(state)
+        self.player, state = snap['player']
+        self.player.restore(state)
+        self.enemies = []
+        for enemy, state in snap['enemies']:
+            enemy.restore(state)
+            self.enemies.append(enemy)
+        self.boss = snap['boss']
+        self.projectiles.restore(snap['projectiles'])
+
+        changed = self.mana_pickups != snap['mana_pickups']
+        self.mana_pickups = list(snap['mana_pickups'])
+        if changed:
+            self.pickup_grid.build(self.mana_pickups)
+        for key, collected in snap['mana_respawn']:
+            self.mana_respawn_data[key]['collected'] = collected
+        self.mana_timers.restore(snap['mana_timers'])
+
+        for loc, state, timer, since in snap['temp_blocks']:
+            block = self.temp_blocks[loc]
+            if (block['state'] == 'broken') != (state == 'broken'):
+                if state == 'broken':
+                    self.tilemap.remove_tile(loc)
+                else:
+                    self.tilemap.set_tile(loc, 'Temp', block['original_variant'])
+            block['state'] = state
+            block['timer'] = timer
+            block['since'] = since
+        self.block_timers.restore(snap['block_timers'])
+
+        if snap['particles']:
+            self.sparks.restore(snap['particles'][0])
+            self.particles.restore(snap['particles'][1])
+
+    def start_recording(self, path):
+        # restarts the level, a replay rebuilds this starting point from just the level and seed
+        self.reset(self.current_level, self.seed)
+        self.recorder = Recorder(path, self.current_level, self.seed, self.batch_enemies)
+
+    def checksum(self):
+        # the exact bits of every value, so any drift in the simulation changes the result. repr would round the
+        # NumPy rows batched enemies keep their position in.
+        player = self.player
+        values = [self.steps, self.current_level, player.dead, *player.pos, *player.velocity, player.hp, player.mana]
+        for enemy in self.enemies:
+            values += [*enemy.pos, enemy.health]
+        return zlib.crc32(struct.pack(f'<{len(values)}d', *values) + self.projectiles.pos[:self.projectiles.count].tobytes())
+
+    def hit_enemy(self, enemy, damage):
+        enemy.health -= damage
+
+        for i in range(8):
+            angle = self.rng.random() * math.pi * 2
+            self.sparks.spawn(enemy.rect().center, angle, self.rng.random())
+
+        if enemy.health <= 0:
+            enemy.die()
+            self.enemies.remove(enemy)
+            if self.enemy_batch:
+                self.enemy_batch.remove(enemy)
+            if enemy == self.boss:
+                self.boss = None
+
+            for i in range(20):
+                angle = self.rng.random() * math.pi * 2
+                self.sparks.spawn(enemy.rect().center, angle, 2 + self.rng.random())
 
-                if block['state'] == 'broken':
-                    block['respawn_timer'] += 1
-                    if block['respawn_timer'] >= 300:
-                        
-                        block['state'] = 'solid'
-                        block['timer'] = 0
-                        block['respawn_timer'] = 0
-                        self.tilemap.tilemap[loc] = {'type' : 'Temp', 'variant' : block['original_variant'], 'pos' : tile_pos}
-                        self.temp_blocks_animation[loc]['shaking'] = self.assets['Temp/Shaking'].copy()
-                        self.temp_blocks_animation[loc]['breaking'] = self.assets['Temp/Breaking'].copy()
-                        self.temp_blocks_animation[loc]['broken'] = self.assets['Temp/Broken'].copy()
-                
-                elif block['state'] in ['solid', 'shaking']:
+    
+    def update(self):
+        # one fixed simulation step, everything here counts steps instead of frames
+        self.ticks += 1
+        self.prev_scroll[0], self.prev_scroll[1] = self.scroll
+        for entity in [self.player] + self.enemies:
+            entity.prev_pos[0], entity.prev_pos[1] = entity.pos
+
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30 
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
+
+        # Temp tiles: a block only costs time while the player stands on it. The end of a break and
+        # the respawn are timer events, the animations are drawn from the tick the state began.
+        respawned = []
+        for event, loc in self.block_timers.advance():
+            block = self.temp_blocks[loc]
+            if event == 'break':
+                #print(f"Block {loc} BROKEN → deleting tile")
+                self.tilemap.remove_tile(loc)
+                block['state'] = 'broken'
+                self.block_timers.schedule(TEMP_RESPAWN_STEPS, ('respawn', loc))
+            else:
+                respawned.append(loc)
+
+        player_rect = self.player.rect()
+        if self.player.collisions['down'] and self.player.velocity[1] >= 0:
+            # only the few tiles right under the player's feet can be stood on
+            for ty in range((player_rect.bottom - 4) // 16, (player_rect.bottom + 4) // 16 + 1):
+                for tx in range(player_rect.left // 16 - 1, player_rect.right // 16 + 1):
+                    loc = (tx, ty)
+                    block = self.temp_blocks.get(loc)
+                    if block is None or block['state'] not in ('solid', 'shaking'):
+                        continue
                     #to test if player is on the block
-                    player_on_block = (self.player.rect().bottom <= block_rect.top + 4 and
-                                        self.player.rect().bottom >= block_rect.top - 4 and
-                                        self.player.rect().right > block_rect.left + 2 and
-                                        self.player.rect().left < block_rect.right - 2 and
-                                        self.player.velocity[1] >= 0
-                                        ) and self.player.collisions['down'] 
-
-                    if player_on_block:
-                        #print(f"Block {loc}: state={block['state']}, timer={block['timer']}") 
+                    block_rect = pygame.Rect(tx * 16, ty * 16, 16, 16)
+                    player_on_block = (player_rect.bottom <= block_rect.top + 4 and
+                                        player_rect.bottom >= block_rect.top - 4 and
+                                        player_rect.right > block_rect.left + 2 and
+                                        player_rect.left < block_rect.right - 2)
+                    if not player_on_block:
+                        continue
+
+                    if block['state'] == 'solid':
+                        #print(f"Changing block {loc} to SHAKING") 
+                        block['state'] = 'shaking'
+                        block['timer'] = 0
+                        block['since'] = self.ticks
                         
-                        if block['state'] == 'solid':
-                            #print(f"Changing block {loc} to SHAKING") 
-                            block['state'] = 'shaking'
+                    elif block['state'] == 'shaking':
+                        block['timer'] += 1
+                        if block['timer'] >= TEMP_SHAKE_STEPS:
+                            #print(f"Changing block {loc} to BREAKING") 
+                            block['state'] = 'breaking'
                             block['timer'] = 0
-                            self.temp_blocks_animation[loc]['shaking'] = self.assets['Temp/Shaking'].copy()
-                            
-                        elif block['state'] == 'shaking':
-                            block['timer'] += 1
-                            if block['timer'] >= 35:
-                                #print(f"Changing block {loc} to BREAKING") 
-                                block['state'] = 'breaking'
-                                block['timer'] = 0
-                                self.temp_blocks_animation[loc]['breaking'] = self.assets['Temp/Breaking'].copy()
-                        
-                elif block['state'] == 'breaking':
-                    anim = self.temp_blocks_animation[loc]['breaking']
-                    anim.update()
-
-                    if anim.done:
-                        #print(f"Block {loc} BROKEN → deleting tile")
-                                
-                        if loc in self.tilemap.tilemap:
-                            del self.tilemap.tilemap[loc]
-                        block['state'] = 'broken'
-                        block['respawn_timer'] = 0
-
-            if self.current_level == 0:        
-                self.clouds.update()
-                self.clouds.render(self.display, offset=render_scroll)
-            self.tilemap.render(self.display, offset=render_scroll)
-
-            for loc in self.temp_blocks:
-                block = self.temp_blocks[loc]
-                tile_pos = [int(s) for s in loc.split(';')]
-                x = tile_pos[0] * 16 - render_scroll[0]
-                y = tile_pos[1] * 16 - render_scroll[1]
-
-                if block['state'] == 'solid':
-                    pass
-
-                elif block['state'] == 'shaking':
-                    anim = self.temp_blocks_animation[loc]['shaking']
-                    img = anim.img()
-                    self.display.blit(img, (x,y))
-
-                elif block['state'] == 'breaking':
-                    anim = self.temp_blocks_animation[loc]['breaking']
-                    img = anim.img()
-                    self.display.blit(img, (x,y))
-
-                elif block['state'] == 'broken':
-                    img = self.temp_blocks_animation[loc]['broken']
-                    self.display.blit(img,(x,y))
-
-
-
-            pulse = abs(math.sin(pygame.time.get_ticks() * 0.003)) * 0.3 + 0.7
-            for mana_pickup in self.mana_pickups:
-                mana_img = self.assets['Mana'][0].copy()
-                mana_img.set_alpha(int(255 * pulse))
-                self.display.blit(mana_img, (mana_pickup.x - render_scroll[0], mana_pickup.y - render_scroll[1]))
-
-                if random.random() < 0.02:
-                    angle = random.random() * math.pi * 2
-                    speed = random.random() * 0.5
-                    self.particles.append(Particle(self, 'ManaAmbience', mana_pickup.center, velocity=[math.cos(angle) * speed, math.sin(angle) * speed], frame=random.randint(0,7)))
-
-            for goal in self.goal:
-                goal_img = self.assets['Goal'][0].copy()
-                goal_img.set_alpha(int(255 * pulse))
-                self.display.blit(goal_img, (goal.x - render_scroll[0], goal.y - render_scroll[1]))
-            
-            
-            if self.player.dead:
-                self.death_timer += 1
-                if self.death_timer > 90:
-                    self.load_level(self.current_level)
-                    self.player.dead = False
-                    self.death_timer = 0
-
+                            block['since'] = self.ticks
+                            self.block_timers.schedule(self.assets['Temp/Breaking'].duration(TEMP_BREAK_SPEED), ('break', loc))
+
+        for loc in respawned:
+            block = self.temp_blocks[loc]
+            block['state'] = 'solid'
+            block['timer'] = 0
+            block['since'] = self.ticks
+            self.tilemap.set_tile(loc, 'Temp', block['original_variant'])
+
+        if self.current_level == 0:        
+            self.clouds.update()
+
+        for mana_pickup in self.mana_pickups:
+            if self.rng.random() < 0.02:
+                angle = self.rng.random() * math.pi * 2
+                speed = self.rng.random() * 0.5
+                self.particles.spawn('ManaAmbience', mana_pickup.center, velocity=[math.cos(angle) * speed, math.sin(angle) * speed], frame=self.rng.randint(0,7))
+        
+        if self.player.dead:
+            self.death_timer += 1
+            if self.death_timer > 90:
+                self.load_level(self.current_level)
+                self.player.dead = False
+                self.death_timer = 0
+
+        if self.enemy_batch:
+            self.enemy_batch.update(self.tilemap)
+        else:
             for enemy in self.enemies.copy():
                 enemy.update(self.tilemap, movement = (0,0))
-                enemy.render(self.display, offset =render_scroll)
 
-            self.player.update(self.tilemap, (self.movement[1]- self.movement[0], 0))
-            self.player.render(self.display, offset=render_scroll)
+        self.player.update(self.tilemap, (self.movement[1]- self.movement[0], 0))
 
-            
-            player_tile_pos = (int(self.player.rect().centerx // 16), int(self.player.rect().centery // 16))
-            tile_loc = str(player_tile_pos[0]) + ';' + str(player_tile_pos[1])
-            if tile_loc in self.tilemap.tilemap:
-                tile = self.tilemap.tilemap[tile_loc]
-                if tile['type'] in ['Lava', 'Hazards'] :
-                    self.player.hp = 0
-                    self.player.die()
-
-            for enemy in self.enemies:
-                if self.player.rect().colliderect(enemy.rect()) and self.player.dashing == 0:
-                    self.player.take_damage(10)
-
-            for mana_pickup in self.mana_pickups.copy():
-                if self.player.rect().colliderect(mana_pickup):
-                    self.player.collect_mana(self.player.max_obtainable_mana)
-                    
-                    for i in range(10):
-                        angle = random.random() * math.pi * 2
-                        speed = random.random() * 2
-                        self.particles.append(Particle(self, 'ManaAmbience', mana_pickup.center, velocity= [math.cos(angle) * speed, math.sin(angle) * speed], frame= random.randint(0,7)))
-
-                    if self.current_level == 2:
-                        mana_key = f"{int(mana_pickup.x)};{int(mana_pickup.y)}"  # respawn timer mechanic of mana in final stage
-                        if mana_key in self.mana_respawn_data:
-                            self.mana_respawn_data[mana_key]['collected'] = True
-                            self.mana_respawn_data[mana_key]['respawn_timer'] = 0
-                    self.mana_pickups.remove(mana_pickup)
-            if self.current_level == 2:
-                for mana_key, data in self.mana_respawn_data.items():
-                    if data['collected']:
-                        data['respawn_timer'] += 1
+        
+        player_tile_pos = (int(self.player.rect().centerx // 16), int(self.player.rect().centery // 16))
+        if self.tilemap.tile_type(player_tile_pos) in ['Lava', 'Hazards'] :
+            self.player.hp = 0
+            self.player.die('hazard')
 
-                        #if data['respawn_timer'] % 60:
-                            #print(f"Mana {mana_key}: timer={data['respawn_timer']}/1200")
-                        
-                        if data['respawn_timer'] >= 1200:
-                            #print(f"RESPAWNING MANA at {mana_key}") 
-                            data['collected'] = False
-                            data['respawn_timer'] = 0
-
-                            self.mana_pickups.append(data['rect'])
-
-                            for i in range(15):
-                                angle = random.random() * math.pi * 2
-                                speed = random.random() * 1.5
-                                self.particles.append(Particle(self, 'ManaAmbience', data['rect'].center,
-                                    velocity=[math.cos(angle) * speed, math.sin(angle) * speed],
-                                    frame=random.randint(0, 7)))
-
-
-            for goal in self.goal:
-                if self.player.rect().colliderect(goal):
-
-                    for i in range(30):
-                        angle = random.random() * math.pi * 2
-                        speed = random.random() * 4
-                        self.sparks.append(Spark(goal.center, angle, 3 + random.random()))
-                    
-                    try:
-                        self.load_level(self.current_level + 1)
-                    except FileNotFoundError:
-                        print("You Win!")  #Subject to change
-                    break
-
-
-            #[[x,y], direction, timer]
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1]
-                projectile[2] += 1
-
-                projectile_type = projectile[4] if len(projectile) > 4 else 'player_basic'
-
-                if projectile_type == 'player_strong':
-                    img = self.assets['Charged_Projectile']
-                elif projectile_type == 'darkmage':
-                    img = self.assets['EProjectile']
-                elif projectile_type == 'flamemite':
-                    img = self.assets['FlameProjectile']
-                else:
-                    img = self.assets['Projectile']
-
-                should_flip = projectile[1] < 0
-                flipped_img = pygame.transform.flip(img, should_flip, False)
-
-
-                self.display.blit(flipped_img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-                if self.tilemap.solid_check(projectile[0]):
-                    self.projectiles.remove(projectile)
-                    for i in range(4):
-                            self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0) , 2 + random.random()))
-
-                elif projectile[2] > 360 :
-                    self.projectiles.remove(projectile)
-
-                else: 
-                    is_enemy_projectile = projectile_type in ['darkmage', 'flamemite']
-
-                    proj_rect = pygame.Rect(projectile[0][0] - 4, projectile[0][1] - 4, 8, 8)
-
-                    if is_enemy_projectile:
-                        if self.player.rect().colliderect(proj_rect) and self.player.dashing == 0:
-                            self.projectiles.remove(projectile)
-                            damage = projectile[3] if len(projectile) > 3 else 15
-                            self.player.take_damage(damage)
-
-                            for i in range(10):
-                                angle = random.random() * math.pi * 2
-                                self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-                    
-                    else :
-                        for enemy in self.enemies.copy():
-                            if enemy.rect().colliderect(proj_rect):
-                                damage = projectile[3] if len(projectile) > 3 else 25
-                                enemy.health -= damage
-
-                                self.projectiles.remove(projectile)
-
-                                for i in range(8):
-                                    angle = random.random() * math.pi * 2
-                                    self.sparks.append(Spark(enemy.rect().center, angle, random.random()))
-
-                                if enemy.health <= 0:
-                                    enemy.die()
-                                    self.enemies.remove(enemy)
-                                    if enemy == self.boss:
-                                        self.boss = None
-
-                                    for i in range(20):
-                                        angle = random.random() * math.pi * 2
-                                        self.sparks.append(Spark(enemy.rect().center, angle, 2 + random.random()))
-                                
-                                break          
-
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset = render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
+        self.enemy_grid.build([enemy.rect() for enemy in self.enemies], list(self.enemies))
+        player_rect = self.player.rect()
 
-            
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset = render_scroll)
-                if particle.type == 'flames':
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
-            
+        if self.player.dashing == 0 and len(self.enemy_grid.query(player_rect)):
+            self.player.take_damage(10, 'enemy')
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+        collected = self.pickup_grid.query(player_rect).tolist()
+        for mana_pickup in [self.mana_pickups[i] for i in collected]:
+            self.player.collect_mana(self.player.max_obtainable_mana)
                 
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = True
-                    if event.key == pygame.K_UP:
-                        self.player.jump()
-                    if event.key == pygame.K_DOWN:
-                        self.movement[2] = True
-                    if event.key == pygame.K_x:
-                        if not self.player.basic_attack():
-                            self.player.attack_fail()
-                    if event.key == pygame.K_z:
-                        if not self.player.strong_attack():
-                            self.player.attack_fail()
-                    if event.key == pygame.K_c:
-                        self.player.dash()
+            for i in range(10):
+                angle = self.rng.random() * math.pi * 2
+                speed = self.rng.random() * 2
+                self.particles.spawn('ManaAmbience', mana_pickup.center, velocity= [math.cos(angle) * speed, math.sin(angle) * speed], frame= self.rng.randint(0,7))
 
+            if self.current_level == 2:
+                mana_key = (int(mana_pickup.x), int(mana_pickup.y))  # respawn timer mechanic of mana in final stage
+                if mana_key in self.mana_respawn_data:
+                    self.mana_respawn_data[mana_key]['collected'] = True
+                    self.mana_timers.schedule(MANA_RESPAWN_STEPS, mana_key)
+        if collected:
+            for i in reversed(collected):
+                del self.mana_pickups[i]
+            self.pickup_grid.build(self.mana_pickups)
+
+        for mana_key in self.mana_timers.advance():
+            #print(f"RESPAWNING MANA at {mana_key}") 
+            data = self.mana_respawn_data[mana_key]
+            data['collected'] = False
+
+            self.mana_pickups.append(data['rect'])
+            self.pickup_grid.build(self.mana_pickups)
+
+            for i in range(15):
+                angle = self.rng.random() * math.pi * 2
+                speed = self.rng.random() * 1.5
+                self.particles.spawn('ManaAmbience', data['rect'].center,
+                    velocity=[math.cos(angle) * speed, math.sin(angle) * speed],
+                    frame=self.rng.randint(0, 7))
+
+
+        for goal in [self.goal[i] for i in self.goal_grid.query(player_rect).tolist()]:
+            for i in range(30):
+                angle = self.rng.random() * math.pi * 2
+                speed = self.rng.random() * 4
+                self.sparks.spawn(goal.center, angle, 3 + self.rng.random())
                 
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = False
-                    if event.key == pygame.K_DOWN:
-                        self.movement[2] = False
-
-            if self.boss and self.boss in self.enemies:
-                self.hud.render_boss_health(self.display, self.boss, "DARK MAGE")
-
-            self.hud.render(self.display)
-
-            self.hud.render_ability_indicators(self.display)
+            try:
+                self.load_level(self.current_level + 1)
+            except FileNotFoundError:
+                if not self.headless:
+                    print("You Win!")  #Subject to change
+                self.won = True
+            break
+
+
+        self.projectiles.update(self.tilemap)
+        self.sparks.update()
+        self.particles.update()
+
+    def step(self, actions = 0):
+        # one simulation step driven by a bitmask of the action bits above instead of the keyboard
+        self.movement[0] = bool(actions & LEFT)
+        self.movement[1] = bool(actions & RIGHT)
+        self.movement[2] = bool(actions & DOWN)
+        if actions & JUMP:
+            self.player.jump()
+        if actions & BASIC_ATTACK:
+            if not self.player.basic_attack():
+                self.player.attack_fail()
+        if actions & STRONG_ATTACK:
+            if not self.player.strong_attack():
+                self.player.attack_fail()
+        if actions & DASH:
+            self.player.dash()
+
+        self.update()
+        self.steps += 1
+        if self.recorder:
+            self.recorder.record(self, actions)
+        return self.state()
+
+    def state(self):
+        player = self.player
+        return {
+            'step' : self.steps,
+            'level' : self.current_level,
+            'won' : self.won,
+            'player' : {'pos' : tuple(player.pos), 'velocity' : tuple(player.velocity), 'hp' : player.hp, 'mana' : player.mana, 'dead' : player.dead,
+                        'death_cause' : player.death_cause, 'mana_collected' : player.mana_collected},
+            'enemies' : [(enemy.type, tuple(map(float, enemy.pos)), enemy.health) for enemy in self.enemies],
+            'projectiles' : self.projectiles.count,
+            'mana_pickups' : len(self.mana_pickups),
+        }
 
+    def handle_events(self):
+        # keyboard -> action bits, presses wait in self.pressed until the next step uses them
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if self.sprite_stats:
+                    print(self.sprites.report())
+                if self.present_stats:
+                    print(self.presenter.report())
+                if self.recorder:
+                    self.recorder.save()
+                pygame.quit()
+                sys.exit()
+            
+            if event.type == pygame.KEYDOWN:
+                self.held |= HELD_KEYS.get(event.key, 0)
+                self.pressed |= PRESS_KEYS.get(event.key, 0)
+
+            if event.type == pygame.KEYUP:
+                self.held &= ~HELD_KEYS.get(event.key, 0)
+
+    def lerp_offset(self, entity, alpha, offset):
+        # drawing with this offset puts the entity alpha of the way from its previous to its current position
+        return (offset[0] + (entity.pos[0] - entity.prev_pos[0]) * (1 - alpha), offset[1] + (entity.pos[1] - entity.prev_pos[1]) * (1 - alpha))
+
+    def render(self, alpha = 1.0):
+        # alpha: how far real time has got between the previous and the current simulation step
+        render_scroll = (int(self.prev_scroll[0] + (self.scroll[0] - self.prev_scroll[0]) * alpha), int(self.prev_scroll[1] + (self.scroll[1] - self.prev_scroll[1]) * alpha))
+
+        if self.dirty_rects:
+            self.render_dirty(render_scroll, alpha)
+            return
+
+        self.render_static(self.display, render_scroll)
+        self.render_dynamic(render_scroll, alpha)
+
+        self.hud.draw(self.display)  # boss health, bars and ability text, redrawn only when they change
+
+        if self.player.dead:
+            self.hud.render_death_screen(self.display)
+
+        self.presenter.present()
+
+    def render_static(self, surf, render_scroll):
+        # what stays put while the camera does: background, clouds (which crawl), tiles and broken temp blocks
+        if self.current_level == 0:
+            surf.blit(self.assets['background'], (0,0))
+        elif self.current_level == 1:
+            surf.blit(self.assets['cavebackground'], (0,0))
+        elif self.current_level == 2:
+            surf.blit(self.assets['castlebackground'], (0,0))
+
+        if self.current_level == 0:        
+            self.clouds.render(surf, offset=render_scroll)
+        self.tilemap.render(surf, offset=render_scroll)
+
+        for loc in self.temp_blocks:
+            if self.temp_blocks[loc]['state'] == 'broken':
+                surf.blit(self.assets['Temp/Broken'], (loc[0] * 16 - render_scroll[0], loc[1] * 16 - render_scroll[1]))
+
+    def render_dynamic(self, render_scroll, alpha, rects = False):
+        # everything that can change from one frame to the next, drawn over render_static. rects=True returns where it drew.
+        drawn = []
+        for loc in self.temp_blocks:
+            block = self.temp_blocks[loc]
+            x = loc[0] * 16 - render_scroll[0]
+            y = loc[1] * 16 - render_scroll[1]
+
+            if block['state'] == 'shaking':
+                img = self.assets['Temp/Shaking'].img(self.ticks, block['since'])
+                drawn.append(self.display.blit(img, (x,y)))
+
+            elif block['state'] == 'breaking':
+                img = self.assets['Temp/Breaking'].img(self.ticks, block['since'], TEMP_BREAK_SPEED)
+                drawn.append(self.display.blit(img, (x,y)))
+
+        pulse = abs(math.sin(pygame.time.get_ticks() * 0.003)) * 0.3 + 0.7
+        for mana_pickup in self.mana_pickups:
+            mana_img = self.sprites.faded(self.assets['Mana'][0], 255 * pulse)
+            drawn.append(self.display.blit(mana_img, (mana_pickup.x - render_scroll[0], mana_pickup.y - render_scroll[1])))
+
+        for goal in self.goal:
+            goal_img = self.sprites.faded(self.assets['Goal'][0], 255 * pulse)
+            drawn.append(self.display.blit(goal_img, (goal.x - render_scroll[0], goal.y - render_scroll[1])))
+
+        for enemy in self.enemies:
+            drawn.append(enemy.render(self.display, offset=self.lerp_offset(enemy, alpha, render_scroll)))
+        drawn.append(self.player.render(self.display, offset=self.lerp_offset(self.player, alpha, render_scroll)))
+
+        shots = self.projectiles.render(self.display, offset=render_scroll, alpha=alpha, rects=rects)
+        sparks = self.sparks.render(self.display, offset = render_scroll)
+        particles = self.particles.render(self.display, offset = render_scroll, rects=rects)
+        if rects:
+            return [rect for rect in drawn + shots + sparks + particles if rect]
+
+    def render_dirty(self, render_scroll, alpha):
+        # Dirty rect mode: while the camera holds still the last frame is kept and only what changed is drawn again.
+        # self.static holds render_static for the current scroll. Every frame the areas last frame's sprites covered
+        # (plus any part of the static layer or HUD that changed) are copied back from it, the sprites are drawn at
+        # their new places and only those areas are sent to the window. Any scroll, level change or death overlay
+        # falls back to a full redraw.
+        size = self.display.get_size()
+        clouds = self.clouds.rects(self.display, render_scroll) if self.current_level == 0 else []
+        broken = {loc for loc, block in self.temp_blocks.items() if block['state'] == 'broken'}
+        full = (self.static is None or render_scroll != self.static_scroll or self.current_level != self.static_level
+                or self.player.dead or self.static_dead)
+
+        if full:
+            if self.static is None:
+                self.static = pygame.Surface(size)
+            self.render_static(self.static, render_scroll)
+            self.display.blit(self.static, (0, 0))
+            self.dirty_drawn = self.render_dynamic(render_scroll, alpha, rects=True)
+            self.hud.draw(self.display)
             if self.player.dead:
                 self.hud.render_death_screen(self.display)
+            self.presenter.present()
+        else:
+            # the static layer changes where a cloud moved a pixel or a temp block broke or came back
+            changed = []
+            for old, new in zip(self.static_clouds, clouds):
+                if old != new:
+                    changed += [old, new]
+            for loc in broken ^ self.static_broken:
+                changed.append(pygame.Rect(loc[0] * 16 - render_scroll[0], loc[1] * 16 - render_scroll[1], 16, 16))
+            changed = [rect.clip(self.display.get_rect()) for rect in changed]
+            for rect in changed:
+                self.static.set_clip(rect)
+                self.render_static(self.static, render_scroll)
+            self.static.set_clip(None)
+
+            hud_rects = list(self.hud.layer_rects)
+            if self.hud.refresh(size):
+                changed += hud_rects + self.hud.layer_rects
+
+            restore = self.dirty_drawn + changed
+            for rect in restore:
+                self.display.blit(self.static, rect, rect)
+            self.dirty_drawn = self.render_dynamic(render_scroll, alpha, rects=True)
+            areas = restore + self.dirty_drawn
+            self.hud.draw_over(self.display, areas)
+            self.presenter.present(areas)
+
+        self.static_scroll = render_scroll
+        self.static_level = self.current_level
+        self.static_dead = self.player.dead
+        self.static_clouds = clouds
+        self.static_broken = broken
 
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
-            self.clock.tick(60) # for keeping the game run at 60 fps
-Game().run()
+    def run(self):
+        # fixed timestep: the simulation always advances in steps of 1 / SIM_RATE seconds, rendering runs as
+        # often as fps (0 = uncapped) allows. A slow machine runs several steps per drawn frame instead of slowing down.
+        step = 1 / SIM_RATE
+        accumulator = 0
+        self.clock.tick()
+        while True:
+            accumulator = min(accumulator + self.clock.tick(self.fps) / 1000, MAX_FRAME_TIME)
+            while accumulator >= step:
+                self.step(self.held | self.pressed)
+                self.pressed = 0
+                accumulator -= step
+            self.handle_events()
+            self.render(accumulator / step)
+
+def startup_profile():
+    # cold: empty pixel cache, warm: the cache the cold start just filled (the OS file cache is warm for both)
+    pixel_cache.cache_dir = tempfile.mkdtemp()
+    for label in ('cold', 'warm'):
+        utils.reset()
+        start = time.perf_counter()
+        Game()
+        total = time.perf_counter() - start
+        print(f'{label} start: {total * 1000:.1f} ms, pixel cache {pixel_cache.hits} hits / {pixel_cache.misses} misses')
+        for group, seconds in sorted(utils.timings.items(), key=lambda item: -item[1]):
+            print(f'  {group:<12} {seconds * 1000:8.1f} ms')
+    utils.reset()
+    shutil.rmtree(pixel_cache.cache_dir)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manaless Mage')
+    parser.add_argument('--batch-enemies', action='store_true', help='update enemies in one vectorized pass (for levels with hundreds of enemies)')
+    parser.add_argument('--sprite-stats', action='store_true', help='print sprite cache memory use and hit rate on exit')
+    parser.add_argument('--fps', type=int, default=60, help='render frame cap, 0 for uncapped (default 60)')
+    parser.add_argument('--seed', type=int, help='seed for all gameplay randomness, random if not given')
+    parser.add_argument('--record', metavar='FILE', help='record the run to a replay file, saved on exit')
+    parser.add_argument('--vsync', action='store_true', help='sync rendering to the display refresh rate')
+    parser.add_argument('--scale', choices=SCALE_MODES, default='scale', help='how frames are scaled to the window (default scale)')
+    parser.add_argument('--present-stats', action='store_true', help='print the time spent presenting frames on exit')
+    parser.add_argument('--dirty-rects', action='store_true', help='only redraw what changed while the camera is still (for slow machines)')
+    parser.add_argument('--startup-profile', action='store_true', help='time a cold and a warm start per asset group, then exit')
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        startup_profile()
+    else:
+        game = Game(batch_enemies=args.batch_enemies, sprite_stats=args.sprite_stats, fps=args.fps, vsync=args.vsync, seed=args.seed,
+                    scale_mode=args.scale, present_stats=args.present_stats, dirty_rects=args.dirty_rects)
+        if args.record:
+            game.start_recording(args.record)
+        game.run()
 
 
 
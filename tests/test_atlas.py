@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame
+
+from Scripts.atlas import Atlas, build
+
+def save_image(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pygame.image.save(pygame.Surface(size, pygame.SRCALPHA), path)
+
+def make_assets(base):
+    save_image(os.path.join(base, 'a', '0.png'), (4, 4))
+    save_image(os.path.join(base, 'a', '1.png'), (4, 4))
+    save_image(os.path.join(base, 'b', '0.png'), (8, 8))
+    build(base)
+
+def test_unchanged_folders_come_from_the_atlas(tmp_path):
+    make_assets(str(tmp_path))
+    atlas = Atlas(str(tmp_path))
+    assert atlas.listdir('a') == ['0.png', '1.png']
+    assert atlas.folder_current('b')
+
+def test_edited_folder_falls_back_to_loose_files(tmp_path):
+    make_assets(str(tmp_path))
+    save_image(os.path.join(str(tmp_path), 'a', '1.png'), (6, 6))
+    atlas = Atlas(str(tmp_path))
+    assert atlas.listdir('a') is None
+    assert atlas.image('a/0.png') is None
+    assert atlas.listdir('b') == ['0.png']
+
+def test_added_and_removed_files_fall_back_to_loose_files(tmp_path):
+    make_assets(str(tmp_path))
+    save_image(os.path.join(str(tmp_path), 'a', '2.png'), (4, 4))
+    os.remove(os.path.join(str(tmp_path), 'b', '0.png'))
+    atlas = Atlas(str(tmp_path))
+    assert atlas.listdir('a') is None
+    assert atlas.image('b/0.png') is None
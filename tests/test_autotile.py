@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Scripts.tilemap import Tilemap, AUTOTILE_MAP, AUTOTILE_TYPES
+
+KEEP = 9  # not produced by AUTOTILE_MAP, so a kept variant shows up as itself
+
+def build():
+    tilemap = Tilemap(None)
+    # a block straddling chunk borders and negative coordinates: corners, edges and middles
+    for x in range(-2, 3):
+        for y in range(14, 18):
+            tilemap.set_tile((x, y), 'Grass', KEEP)
+    tilemap.set_tile((10, 10), 'Stone', KEEP)  # isolated
+    for x in range(20, 24):
+        tilemap.set_tile((x, 3), 'Wall', KEEP)  # a one tile thick row, no AUTOTILE_MAP entry for its middle
+    tilemap.set_tile((3, 15), 'Stone', KEEP)  # different type touching the block, not a neighbour
+    tilemap.set_tile((30, 30), 'Lava', KEEP)
+    tilemap.set_tile((30, 31), 'Lava', KEEP)
+    tilemap.set_tile((31, 30), 'Temp', KEEP)  # not autotiled
+    return tilemap
+
+def reference(tilemap):
+    # the original per-tile rule, straight from AUTOTILE_MAP
+    variants = {}
+    for loc, tile_type, variant in tilemap.iter_tiles():
+        neighbors = set()
+        for shift in [(1,0),(-1,0), (0,-1), (0,1)]:
+            if tilemap.tile_type((loc[0] + shift[0], loc[1] + shift[1])) == tile_type:
+                neighbors.add(shift)
+        neighbors = tuple(sorted(neighbors))
+        if tile_type in AUTOTILE_TYPES and neighbors in AUTOTILE_MAP:
+            variant = AUTOTILE_MAP[neighbors]
+        variants[loc] = variant
+    return variants
+
+def variants(tilemap):
+    return {loc : variant for loc, tile_type, variant in tilemap.iter_tiles()}
+
+def test_whole_map_pass_matches_autotile_map():
+    tilemap = build()
+    expected = reference(tilemap)
+    tilemap.autotile()
+    assert variants(tilemap) == expected
+    assert expected[(10, 10)] == KEEP and expected[(-2, 14)] == 0 and expected[(0, 15)] == 8
+
+def test_incremental_pass_matches_whole_map_pass():
+    tilemap = build()
+    tilemap.autotile(dirty_only=True)
+    assert variants(tilemap) == reference(build())
+
+    # edits only re-tile around themselves, a whole map pass afterwards must find nothing left to change
+    tilemap.remove_tile((0, 15))
+    tilemap.set_tile((10, 11), 'Stone', KEEP)
+    tilemap.set_tile((11, 10), 'Stone', KEEP)
+    tilemap.autotile(dirty_only=True)
+    incremental = variants(tilemap)
+    tilemap.autotile()
+    assert variants(tilemap) == incremental
+    assert incremental[(10, 10)] == 0 and incremental[(10, 11)] == KEEP
+
+def test_whole_map_pass_matches_autotile_map_on_the_levels():
+    maps = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Maps')
+    for level in range(3):
+        tilemap = Tilemap(None)
+        tilemap.load(os.path.join(maps, f'{level}.json'))
+        expected = reference(tilemap)
+        tilemap.autotile()
+        assert variants(tilemap) == expected
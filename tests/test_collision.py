@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Scripts.entities import PhysicsEntity
+from Scripts.tilemap import Tilemap
+
+class StubAnimation:
+    def copy(self):
+        return self
+
+    def update(self):
+        pass
+
+class StubGame:
+    ticks = 0
+    assets = {'Stub/idle': StubAnimation()}
+
+def temp_row(length, y):
+    tilemap = Tilemap(None)
+    for x in range(length):
+        tilemap.set_tile((x, y), 'Temp')
+    return tilemap
+
+def test_rects_are_single_tiles():
+    tilemap = temp_row(10, 5)
+    rects = tilemap.physics_rects_around((68, 72))
+    assert sorted(tuple(r) for r in rects) == [(48, 80, 16, 16), (64, 80, 16, 16), (80, 80, 16, 16)]
+
+def test_entity_inside_run_is_pushed_out_of_the_tile_it_hit():
+    # a Temp block respawning over an entity leaves it overlapping the middle of the row
+    tilemap = temp_row(10, 5)
+    entity = PhysicsEntity(StubGame(), 'Stub', (68, 72), (8, 16))
+    entity.update(tilemap, (1, 0))
+    assert entity.pos[0] == 56
+    assert entity.collisions['right']
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest
+
+from Scripts.tilemap import Tilemap
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Maps')
+
+def load(path):
+    tilemap = Tilemap(None)
+    tilemap.load(path)
+    return tilemap
+
+@pytest.mark.parametrize('level', [0, 1, 2])
+def test_binary_map_loads_like_the_json(tmp_path, level):
+    source = load(os.path.join(MAPS, f'{level}.json'))
+    path = str(tmp_path / f'{level}.map')
+    source.save(path)
+    loaded = load(path)
+
+    # same tiles in the same order, which is the order enemies and pickups are extracted in
+    assert list(loaded.iter_tiles()) == list(source.iter_tiles())
+    assert list(loaded.offgrid) == list(source.offgrid)
+    assert loaded.tile_size == source.tile_size
+
+def test_rewriting_a_mapped_file_keeps_open_maps_intact(tmp_path):
+    path = str(tmp_path / 'level.map')
+    load(os.path.join(MAPS, '0.json')).save(path)
+    mapped = load(path)
+    tiles = list(mapped.iter_tiles())
+
+    other = Tilemap(None)
+    other.set_tile((0, 0), 'Stone')
+    other.save(path)
+
+    assert list(mapped.iter_tiles()) == tiles
+    assert list(load(path).iter_tiles()) == [((0, 0), 'Stone', 0)]
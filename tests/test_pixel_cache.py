@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame
+import pytest
+
+from Scripts import pixel_cache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(pixel_cache, 'cache_dir', str(tmp_path / 'cache'))
+    pixel_cache.reset()
+    yield tmp_path
+    pixel_cache.reset()
+
+def save_image(path, color):
+    surf = pygame.Surface((4, 4), pygame.SRCALPHA)
+    surf.fill(color)
+    pygame.image.save(surf, path)
+
+def cached_files():
+    return sorted(name for name in os.listdir(pixel_cache.cache_dir) if name.endswith('.rgba'))
+
+def test_unchanged_source_is_not_read(cache, monkeypatch):
+    path = str(cache / 'a.png')
+    save_image(path, (255, 0, 0, 255))
+    pixel_cache.load_many([path])
+    pixel_cache.reset()
+
+    def no_hashing(*args, **kwargs):
+        raise AssertionError('source was hashed')
+    monkeypatch.setattr(pixel_cache.hashlib, 'blake2b', no_hashing)
+    surf = pixel_cache.load(path)
+    assert surf.get_at((0, 0)) == (255, 0, 0, 255)
+    assert (pixel_cache.hits, pixel_cache.misses) == (1, 0)
+
+def test_touched_source_is_not_decoded_again(cache):
+    path = str(cache / 'a.png')
+    save_image(path, (255, 0, 0, 255))
+    pixel_cache.load_many([path])
+    pixel_cache.reset()
+
+    os.utime(path, ns=(1, 1))
+    pixel_cache.load_many([path])
+    assert (pixel_cache.hits, pixel_cache.misses) == (1, 0)
+
+def test_edited_source_replaces_its_entry(cache):
+    path = str(cache / 'a.png')
+    save_image(path, (255, 0, 0, 255))
+    pixel_cache.load_many([path])
+    old = cached_files()
+    pixel_cache.reset()
+
+    save_image(path, (0, 255, 0, 255))
+    os.utime(path, ns=(1, 1))
+    surf = pixel_cache.load_many([path])[0]
+    assert surf.get_at((0, 0)) == (0, 255, 0, 255)
+    assert pixel_cache.misses == 1
+    assert len(cached_files()) == 1 and cached_files() != old